@@ -0,0 +1,330 @@
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import deque
+
+from metrics import get_metrics
+
+INTERACTIVE = 'interactive'
+BATCH = 'batch'
+# Lanes in priority order: a free slot always goes to the first non-empty lane
+LANES = (INTERACTIVE, BATCH)
+
+# Generations one Ollama host runs at once (match its OLLAMA_NUM_PARALLEL)
+DEFAULT_BACKEND_CONCURRENCY = int(os.environ.get('OLLAMA_MAX_CONCURRENCY', 4))
+DEFAULT_QUEUE_LIMITS = {
+    INTERACTIVE: int(os.environ.get('ADMISSION_QUEUE', 32)),
+    BATCH: int(os.environ.get('ADMISSION_BATCH_QUEUE', 512)),
+}
+DEFAULT_TIMEOUTS = {
+    INTERACTIVE: float(os.environ.get('ADMISSION_TIMEOUT', 30)),
+    BATCH: float(os.environ.get('ADMISSION_BATCH_TIMEOUT', 600)),
+}
+# Assumed generation time until one has been measured
+INITIAL_HOLD_SECONDS = 5.0
+# Weight of the newest sample in the slot hold-time moving average
+HOLD_ALPHA = 0.2
+# _pick_host() result when every host that could serve the model is at its cap
+FULL = object()
+
+
+class Overloaded(Exception):
+    """No generation slot: the lane's queue is full or the wait timed out"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Withdrawn(Exception):
+    """The request was cancelled while it waited for a slot"""
+
+
+class Ticket:
+    """One admitted generation slot on host; release exactly once"""
+
+    __slots__ = ('controller', 'lane', 'host', 'granted', 'wait_seconds', 'released')
+
+    def __init__(self, controller, lane, host, wait_seconds):
+        self.controller = controller
+        self.lane = lane
+        # Base URL of the backend the slot is on; None without a backend pool
+        self.host = host
+        self.granted = time.perf_counter()
+        self.wait_seconds = wait_seconds
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.controller._release(self)
+
+
+class _Waiter:
+    __slots__ = ('lane', 'model', 'prefer', 'enqueued', 'notify', 'ticket')
+
+    def __init__(self, lane, model, prefer, enqueued, notify):
+        self.lane = lane
+        self.model = model
+        self.prefer = prefer
+        self.enqueued = enqueued
+        self.notify = notify
+        self.ticket = None
+
+
+def _set_done(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class AdmissionController:
+    """Cap concurrent generations and queue the rest by priority lane
+
+    Each backend runs at most per_backend generations. A slot is taken on
+    a specific host: the preferred one (a follow-up's previous host) while
+    it has room, otherwise the least loaded host serving the model, and
+    the ticket's host is where the generation is then sent. Requests that
+    find no free slot wait in a bounded FIFO per lane; when a slot frees
+    up, interactive waiters are served before batch ones, skipping any
+    whose hosts are all still full. A full queue or a wait past the
+    lane's timeout raises Overloaded with a Retry-After estimate.
+
+    Sync callers block in acquire(); coroutines await acquire_async().
+    Both share the same slots, so the async app's batch threads and its
+    streaming coroutines compete fairly.
+    """
+
+    def __init__(self, backend_pool=None, per_backend=DEFAULT_BACKEND_CONCURRENCY,
+                 queue_limits=None, timeouts=None):
+        self.backend_pool = backend_pool
+        self.per_backend = per_backend
+        self.queue_limits = dict(DEFAULT_QUEUE_LIMITS, **(queue_limits or {}))
+        self.timeouts = dict(DEFAULT_TIMEOUTS, **(timeouts or {}))
+        self.lock = threading.Lock()
+        self.queues = {lane: deque() for lane in LANES}
+        self.in_use = 0
+        # host -> slots held on it
+        self.held = {}
+        self.avg_hold = None
+        self.counters = {lane: {'admitted': 0, 'queued': 0, 'rejected': 0, 'timed_out': 0,
+                                'cancelled': 0}
+                         for lane in LANES}
+        self.max_depth = {lane: 0 for lane in LANES}
+
+    def configure(self, backend_pool=None, per_backend=None):
+        if backend_pool is not None:
+            self.backend_pool = backend_pool
+        if per_backend is not None:
+            self.per_backend = per_backend
+        with self.lock:
+            self._dispatch()
+
+    def capacity(self):
+        if self.backend_pool is None:
+            return self.per_backend
+        healthy = sum(1 for backend in self.backend_pool.backends if backend.healthy)
+        return self.per_backend * max(1, healthy)
+
+    def retry_after(self):
+        """Seconds until a slot is likely free for a request that queued now"""
+        hold = self.avg_hold if self.avg_hold is not None else INITIAL_HOLD_SECONDS
+        waiting = sum(len(queue) for queue in self.queues.values())
+        return max(1, math.ceil(hold * (waiting + 1) / max(1, self.capacity())))
+
+    def _pick_host(self, model, prefer):
+        """Under the lock: the host to take a slot on for model, or FULL
+
+        Without a backend pool there is a single host, None.
+        """
+        if self.backend_pool is None:
+            return None if self.held.get(None, 0) < self.per_backend else FULL
+        backends = (self.backend_pool.candidates(model) if model
+                    else self.backend_pool.backends)
+        free = [b for b in backends if self.held.get(b.base_url, 0) < self.per_backend]
+        if not free:
+            return FULL
+        if any(b.base_url == prefer for b in free):
+            return prefer
+        return min(
+            free,
+            key=lambda b: (self.held.get(b.base_url, 0),
+                           b.latency if b.latency is not None else 0.0),
+        ).base_url
+
+    def _grant(self, lane, host, wait_seconds):
+        """Under the lock: take a slot on host"""
+        self.in_use += 1
+        self.held[host] = self.held.get(host, 0) + 1
+        self.counters[lane]['admitted'] += 1
+        get_metrics().record_admission(lane, 'admitted', wait_seconds)
+        return Ticket(self, lane, host, wait_seconds)
+
+    def _admit_now(self, lane, model, prefer, started):
+        """Under the lock: a Ticket if the request may take a free slot right away"""
+        # Waiters that can run get their slots first, so whatever is left
+        # over is on hosts nobody in the queue can use: no queue is jumped
+        self._dispatch()
+        host = self._pick_host(model, prefer)
+        if host is FULL:
+            return None
+        return self._grant(lane, host, time.perf_counter() - started)
+
+    def _enqueue(self, lane, model, prefer, started, notify):
+        """Under the lock: queue a waiter, or raise Overloaded if the lane is full"""
+        queue = self.queues[lane]
+        if len(queue) >= self.queue_limits[lane]:
+            self.counters[lane]['rejected'] += 1
+            get_metrics().record_admission(lane, 'rejected')
+            raise Overloaded(f'Too many {lane} requests queued', self.retry_after())
+        waiter = _Waiter(lane, model, prefer, started, notify)
+        queue.append(waiter)
+        self.counters[lane]['queued'] += 1
+        self.max_depth[lane] = max(self.max_depth[lane], len(queue))
+        return waiter
+
+    def _dispatch(self):
+        """Under the lock: hand free slots to waiters, highest priority lane first
+
+        A waiter whose hosts are all full stays at the head of its queue
+        without holding up waiters behind it that can run elsewhere.
+        """
+        for lane in LANES:
+            queue = self.queues[lane]
+            for waiter in list(queue):
+                host = self._pick_host(waiter.model, waiter.prefer)
+                if host is FULL:
+                    continue
+                queue.remove(waiter)
+                waiter.ticket = self._grant(lane, host, time.perf_counter() - waiter.enqueued)
+                waiter.notify()
+
+    def _give_up(self, waiter):
+        """Under the lock: drop a waiter that stopped waiting; False if it already got a slot"""
+        if waiter.ticket is not None:
+            return False
+        self.queues[waiter.lane].remove(waiter)
+        return True
+
+    def _timed_out(self, lane):
+        self.counters[lane]['timed_out'] += 1
+        get_metrics().record_admission(lane, 'timed_out')
+        return Overloaded(f'Timed out waiting for a free {lane} slot', self.retry_after())
+
+    def _cancelled(self, lane):
+        self.counters[lane]['cancelled'] += 1
+        get_metrics().record_admission(lane, 'cancelled')
+
+    def acquire(self, lane=INTERACTIVE, timeout=None, model=None, prefer=None, cancel=None):
+        """Block until a slot is free and return its Ticket; raises Overloaded
+
+        model limits the slot to hosts serving it; prefer (a base URL) is
+        the host to use while it has room. cancel (a transport.CancelScope,
+        or anything with is_set() and add_callback()) lets another thread
+        take a queued request out of its lane, which raises Withdrawn.
+        """
+        timeout = self.timeouts[lane] if timeout is None else timeout
+        started = time.perf_counter()
+        granted = threading.Event()
+        with self.lock:
+            ticket = self._admit_now(lane, model, prefer, started)
+            if ticket is not None:
+                return ticket
+            waiter = self._enqueue(lane, model, prefer, started, granted.set)
+        if cancel is not None:
+            cancel.add_callback(granted.set)
+        granted.wait(timeout)
+        with self.lock:
+            if self._give_up(waiter):
+                if cancel is not None and cancel.is_set():
+                    self._cancelled(lane)
+                    raise Withdrawn(f'Cancelled waiting for a free {lane} slot')
+                raise self._timed_out(lane)
+        return waiter.ticket
+
+    async def acquire_async(self, lane=INTERACTIVE, timeout=None, model=None, prefer=None):
+        """acquire() for coroutines; a cancelled waiter leaves the queue"""
+        timeout = self.timeouts[lane] if timeout is None else timeout
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+        with self.lock:
+            ticket = self._admit_now(lane, model, prefer, started)
+            if ticket is not None:
+                return ticket
+            waiter = self._enqueue(lane, model, prefer, started,
+                                   lambda: loop.call_soon_threadsafe(_set_done, granted))
+        try:
+            await asyncio.wait_for(asyncio.shield(granted), timeout)
+        except asyncio.TimeoutError:
+            with self.lock:
+                if self._give_up(waiter):
+                    raise self._timed_out(lane)
+        except asyncio.CancelledError:
+            with self.lock:
+                gave_up = self._give_up(waiter)
+                if gave_up:
+                    self._cancelled(lane)
+            if not gave_up:
+                waiter.ticket.release()
+            raise
+        return waiter.ticket
+
+    def _release(self, ticket):
+        held = time.perf_counter() - ticket.granted
+        with self.lock:
+            self.in_use -= 1
+            self.held[ticket.host] -= 1
+            if not self.held[ticket.host]:
+                del self.held[ticket.host]
+            if self.avg_hold is None:
+                self.avg_hold = held
+            else:
+                self.avg_hold += HOLD_ALPHA * (held - self.avg_hold)
+            self._dispatch()
+
+    def depths(self):
+        with self.lock:
+            return {lane: len(queue) for lane, queue in self.queues.items()}
+
+    def stats(self):
+        with self.lock:
+            return {
+                'capacity': self.capacity(),
+                'per_backend': self.per_backend,
+                'in_use': self.in_use,
+                'hosts': {host or 'default': held for host, held in self.held.items()},
+                'avg_hold_seconds': self.avg_hold,
+                'retry_after': self.retry_after(),
+                'lanes': {
+                    lane: dict(self.counters[lane],
+                               depth=len(self.queues[lane]),
+                               max_depth=self.max_depth[lane],
+                               queue_limit=self.queue_limits[lane],
+                               timeout=self.timeouts[lane])
+                    for lane in LANES
+                },
+            }
+
+
+_default_admission = None
+_default_lock = threading.Lock()
+
+
+def get_admission():
+    """Return the process-wide admission controller shared by every generation"""
+    global _default_admission
+    if _default_admission is None:
+        with _default_lock:
+            if _default_admission is None:
+                _default_admission = AdmissionController()
+                metrics = get_metrics()
+                metrics.register_gauge(
+                    'summarizer_admission_queue_depth', 'Generations waiting for a slot, by lane',
+                    lambda: {(('lane', lane),): depth
+                             for lane, depth in _default_admission.depths().items()})
+                metrics.register_gauge(
+                    'summarizer_admission_in_use', 'Generation slots in use',
+                    lambda: {(): _default_admission.in_use})
+    return _default_admission
@@ -0,0 +1,291 @@
+import argparse
+import json
+
+import requests
+
+from agent_request import SummaryRequest, normalize_text
+from model_lifecycle import base_url, keep_alive_for
+from ollama_stream import print_content, read_chat_reply
+from singleflight import DeadlineExceeded, UpstreamUnavailable, get_single_flight, parse_deadline
+from sizing import DEFAULT_NUM_PREDICT, plan_context, record_num_ctx
+from summary_cache import get_summary_cache
+from transport import get_transport, is_cancelled
+
+DEFAULT_MODEL = 'llama3.2'
+DEFAULT_OPTIONS = {'temperature': 0.0}
+HEADERS = {'Content-Type': 'application/json'}
+
+
+class AgentDefinition:
+    """One summarization style as data: name, system prompt, model and options
+
+    Definitions are read from JSON and all run on the same Agent engine, so
+    an agent costs its prompt string and a few fields, not a module.
+    """
+
+    __slots__ = ('name', 'prompt', 'model', 'options', 'num_predict', 'description')
+
+    def __init__(self, name, prompt, model=DEFAULT_MODEL, options=None,
+                 num_predict=DEFAULT_NUM_PREDICT, description=None):
+        if not isinstance(name, str) or not name.strip():
+            raise ValueError('Agent definition has no name')
+        if not isinstance(prompt, str) or not prompt.strip():
+            raise ValueError(f'Agent {name} has no prompt')
+        if options is not None and not isinstance(options, dict):
+            raise ValueError(f'Agent {name}: options must be an object')
+        self.name = name.strip()
+        self.prompt = prompt
+        self.model = model
+        # Ollama options on top of temperature 0; num_ctx is sized per request
+        self.options = dict(DEFAULT_OPTIONS, **(options or {}))
+        # Output token budget (num_predict)
+        self.num_predict = int(num_predict)
+        self.description = description
+
+    @classmethod
+    def from_dict(cls, data):
+        if not isinstance(data, dict):
+            raise ValueError('Agent definition must be an object')
+        unknown = set(data) - set(cls.__slots__)
+        if unknown:
+            raise ValueError(f"Unknown agent definition fields: {', '.join(sorted(unknown))}")
+        return cls(**data)
+
+    def to_dict(self):
+        return {'name': self.name, 'description': self.description, 'model': self.model,
+                'num_predict': self.num_predict, 'options': self.options}
+
+
+def load_definitions(file_path):
+    """Agent definitions from a JSON file holding one definition or a list of them"""
+    with open(file_path, encoding='utf-8') as f:
+        data = json.load(f)
+    entries = data if isinstance(data, list) else [data]
+    return [AgentDefinition.from_dict(entry) for entry in entries]
+
+
+class Agent:
+    """The summarization engine every agent definition runs on
+
+    Holds the definition and where to send requests, nothing per request
+    (that lives in SummaryRequest), so one instance serves every thread.
+    """
+
+    __slots__ = ('definition', 'name', 'model', 'num_predict', 'url', 'backend_pool',
+                 'system_prompt')
+
+    headers = HEADERS
+
+    def __init__(self, definition, host="localhost", port=11434, model=None, backend_pool=None):
+        self.definition = definition
+        self.name = definition.name
+        self.model = model or definition.model
+        self.num_predict = definition.num_predict
+        self.url = f"http://{host}:{port}/api/chat"
+        self.backend_pool = backend_pool
+        self.system_prompt = {"role": "system", "content": definition.prompt}
+
+    def prepare_messages(self, user_content, normalized=False):
+        # Normalize text: remove excessive whitespace and line breaks
+        cleaned_text = user_content if normalized else normalize_text(user_content)
+        return [
+            self.system_prompt,
+            {"role": "user", "content": cleaned_text}
+        ]
+
+    def build_payload(self, messages, plan=None):
+        # num_ctx sized to the input, never Ollama's default that cuts long inputs off
+        plan = plan or plan_context(messages, self.num_predict, self.model)
+        return {
+            "model": self.model,
+            "options": {**self.definition.options, **plan.options()},
+            "keep_alive": keep_alive_for(self.model),
+            "stream": True,
+            "messages": messages
+        }
+
+    def create_request(self, text, normalized=False):
+        """Build the per-request messages and payload without touching agent state"""
+        messages = self.prepare_messages(text, normalized)
+        plan = plan_context(messages, self.num_predict, self.model)
+        return SummaryRequest(text, messages, self.build_payload(messages, plan), sizing=plan)
+
+    def send_streaming_request(self, payload, prefer=None):
+        # With a backend pool, each request goes to the least-loaded host
+        # (or to prefer, the host that served the earlier turns of a conversation)
+        lease = self.backend_pool.acquire(payload["model"], prefer) if self.backend_pool else None
+        url = lease.chat_url if lease else self.url
+        try:
+            response = get_transport().post(url, json=payload, headers=self.headers, stream=True,
+                                            on_close=lease.release if lease else None)
+            if response.status_code == 200:
+                response.ollama_host = base_url(url)
+                record_num_ctx(payload)
+                return response
+            else:
+                print(f"API Error: {response.status_code} - {response.text}")
+                response.close()
+                return None
+        except requests.exceptions.RequestException as e:
+            if lease:
+                lease.release(ok=False)
+            if is_cancelled():
+                # Cut off on purpose because nobody wants the reply any more
+                return None
+            if lease and isinstance(e, requests.exceptions.ConnectionError):
+                self.backend_pool.mark_down(lease.backend, e)
+            print(f"Request failed: {e}")
+            return None
+
+    def process_stream(self, response, display_output=True):
+        if display_output:
+            print("\nSUMMARIZED-AI: ", end='', flush=True)
+        try:
+            full_reply = read_chat_reply(
+                response.iter_lines(),
+                on_content=print_content if display_output else None)
+            if display_output:
+                print()  # newline after summary
+            return full_reply
+        finally:
+            response.close()
+
+    def summarize_text(self, text: str, stats: dict = None, timeout: float = None) -> str:
+        """Main method to summarize text with error handling
+
+        Pass a dict as stats to receive the generation's timings and token counts.
+        With timeout (seconds), stop waiting after that long; the generation is
+        stopped too unless another request is following it.
+        """
+        if not text.strip():
+            return "No text provided to summarize."
+
+        try:
+            payload = self.create_request(text).payload
+            cached = get_summary_cache().get(payload)
+            if cached is not None:
+                print(f"\nSUMMARIZED-AI (cached): {cached}")
+                if stats is not None:
+                    stats['cached'] = True
+                return cached
+            # Identical requests already running share one upstream generation
+            flight = get_single_flight().join(payload, self.send_streaming_request, self.name)
+            print("\nSUMMARIZED-AI: ", end='', flush=True)
+            for chunk in flight.subscribe(parse_deadline(timeout)):
+                print(chunk, end='', flush=True)
+            print()  # newline after summary
+            summary = flight.text()
+            if stats is not None:
+                stats.update(flight.stats.to_dict(), cached=False)
+            return summary
+
+        except DeadlineExceeded:
+            print()
+            return "Summarization timed out."
+        except UpstreamUnavailable:
+            return "Failed to get response from the API."
+        except Exception as e:
+            return f"Error during summarization: {e}"
+
+
+def get_multiline_input(agent_name):
+    """Get multi-line input from user, handling paste operations properly"""
+    print(f"Enter text to: {agent_name} (paste your text and press Enter twice to finish):")
+    print("(Type 'exit' to quit, 'clear' to clear screen)")
+    print("> ", end='', flush=True)
+
+    lines = []
+    empty_line_count = 0
+
+    try:
+        while True:
+            try:
+                line = input()
+
+                # Check for commands
+                if line.strip().lower() in {"exit", "quit"}:
+                    return "EXIT"
+                elif line.strip().lower() == "clear":
+                    return "CLEAR"
+
+                # If line is empty, increment counter
+                if not line.strip():
+                    empty_line_count += 1
+                    # If we get two empty lines in a row, finish input
+                    if empty_line_count >= 2:
+                        break
+                else:
+                    empty_line_count = 0
+                    lines.append(line)
+
+            except EOFError:
+                # Handle Ctrl+D
+                return "EXIT"
+
+    except KeyboardInterrupt:
+        return "INTERRUPT"
+
+    # Join all lines and return
+    full_text = '\n'.join(lines).strip()
+    return full_text if full_text else None
+
+
+def run_chat(agent):
+    """Summarize text pasted at the terminal with one agent until 'exit'"""
+    agent_name = f"--{agent.name} Summarizer"
+    print(agent_name)
+    print("Tip: You can paste multi-line text directly. Press Enter twice when done.")
+
+    while True:
+        try:
+            print("\n" + "="*60)
+
+            # Get multi-line input
+            user_input = get_multiline_input(agent_name)
+
+            if user_input == "EXIT":
+                print("Exiting. Goodbye!")
+                break
+
+            elif user_input == "CLEAR":
+                print("\033[2J\033[H")  # Clear screen
+                print(agent_name)
+                print("Tip: You can paste multi-line text directly. Press Enter twice when done.")
+                continue
+
+            elif user_input == "INTERRUPT":
+                print("\nUse 'exit' to quit properly.")
+                continue
+            elif not user_input:
+                print("No text entered. Please provide some text to summarize.")
+                continue
+
+            # Show what we received (truncated)
+            print(f"\nReceived text ({len(user_input)} characters)")
+            agent.summarize_text(user_input)
+
+        except KeyboardInterrupt:
+            print("\n\nUse 'exit' to quit properly.")
+            continue
+        except Exception as e:
+            print(f"\nUnexpected error: {e}")
+            continue
+
+
+def main():
+    from agent_manage import AgentManager
+
+    manager = AgentManager()
+    names = manager.get_available_agents()
+    parser = argparse.ArgumentParser(description="Summarize text at the terminal with one agent")
+    parser.add_argument('agent', nargs='?', default=names[0] if names else None,
+                        help=f"agent name ({', '.join(names)})")
+    args = parser.parse_args()
+    agent = manager.get_agent_instance(args.agent) if args.agent else None
+    if agent is None:
+        parser.error(f"Unknown agent: {args.agent}")
+    run_chat(agent)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,65 +1,431 @@
 import importlib.util
-import inspect
+import json
 import os
+import re
+import threading
+import time
+from collections import deque
+
+from admission import INTERACTIVE
+from agent_engine import DEFAULT_MODEL, Agent, AgentDefinition, load_definitions
+from map_reduce import MapReduceSummarizer, DEFAULT_CHUNK_TOKENS, DEFAULT_CONCURRENCY
+from sizing import DEFAULT_NUM_PREDICT
+
+DEFAULT_AGENTS_DIR = os.environ.get(
+    'AGENTS_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'agents'))
+MANIFEST_NAME = 'manifest.json'
+DEFAULT_RELOAD_INTERVAL = float(os.environ.get('AGENT_RELOAD_INTERVAL', 1.0))
+RELOAD_EVENTS = 100
+
+
+class AgentSpec:
+    """Where to find one agent; known before anything is imported
+
+    An agent is either a definition (data run by the shared Agent engine,
+    read from JSON at discovery) or a class in a Python module.
+    """
+
+    __slots__ = ('name', 'class_name', 'file_path', 'definition')
+
+    def __init__(self, name, class_name, file_path, definition=None):
+        self.name = name
+        self.class_name = class_name
+        self.file_path = file_path
+        self.definition = definition
+
+    def to_dict(self):
+        return {'name': self.name, 'class': self.class_name,
+                'file': os.path.basename(self.file_path),
+                'description': self.definition.description if self.definition else None}
+
+
+# A top-level class named *Agent with its bases, up to the next unindented line
+AGENT_CLASS = re.compile(r'^class\s+(\w+Agent)\b\s*(?:\(([^)]*)\))?.*?(?=^\S|\Z)',
+                         re.M | re.S)
+# A base class named *Agent, such as Agent or agent_engine.Agent
+AGENT_BASE = re.compile(r'\w*Agent\b')
+
+
+def scan_agent_classes(file_path):
+    """Names of the agent classes a file defines, found without importing it
+
+    A class whose name ends in 'Agent' and that either derives from a
+    class named *Agent (agent_engine.Agent or a subclass of it) or, like
+    the original standalone agents, has a summarize_text method. A text
+    scan rather than a full parse keeps discovery cheap with many agents.
+    """
+    with open(file_path, encoding='utf-8') as f:
+        source = f.read()
+    return [match.group(1) for match in AGENT_CLASS.finditer(source)
+            if AGENT_BASE.search(match.group(2) or '') or
+            'def summarize_text' in match.group(0)]
+
+
+def definition_from_class(agent_class, name):
+    """The AgentDefinition a standalone agent class describes
+
+    The class is instantiated with its defaults and read for system_prompt
+    (a message dict or a string), model, options and num_predict.
+    """
+    instance = agent_class()
+    prompt = getattr(instance, 'system_prompt', None)
+    if isinstance(prompt, dict):
+        prompt = prompt.get('content')
+    if not prompt:
+        raise ValueError(f'{agent_class.__name__} has no system_prompt')
+    return AgentDefinition(
+        name, prompt,
+        model=getattr(instance, 'model', DEFAULT_MODEL),
+        options=getattr(instance, 'options', None),
+        num_predict=getattr(instance, 'num_predict', DEFAULT_NUM_PREDICT),
+        description=(agent_class.__doc__ or '').strip() or None,
+    )
+
 
 class AgentManager:
-    def __init__(self):
+    def __init__(self, backend_pool=None, agents_dir=DEFAULT_AGENTS_DIR):
+        self.backend_pool = backend_pool
+        self.agents_dir = agents_dir
         self.agents = {}
         self.agent_classes = {}
-        self.load_agents()
-    
+        self.specs = None
+        self.discovery_seconds = None
+        self.import_seconds = {}
+        self.load_errors = {}
+        # Agent files that failed to scan or parse in the last discovery
+        self.scan_errors = {}
+        # Agent instances are shared across request threads; per-request
+        # state lives in SummaryRequest, so only discovery, imports and
+        # creation need the lock
+        self.lock = threading.RLock()
+        self.file_stamps = {}
+        self.reload_events = deque(maxlen=RELOAD_EVENTS)
+        self.reload_counts = {'reloaded': 0, 'rejected': 0, 'added': 0, 'removed': 0}
+        self.watcher = None
+        self.watch_interval = None
+        self.watch_stop = threading.Event()
+
     def load_agents(self):
-        """Dynamically load agent classes from Python files"""
-        # You can extend this to scan a directory for agent files
-        agent_files = [
-            'agents/condensed_agent.py',
-            'agents/descriptive_agent.py',
-            'agents/context_agent.py',
-            'agents/storyboard_agent.py',
-        ]
-        
-        for file_path in agent_files:
-            if os.path.exists(file_path):
-                try:
-                    self.load_agent_from_file(file_path)
-                except Exception as e:
-                    print(f"Error loading {file_path}: {e}")
-    
+        """Discover agents from the manifest or the agents directory without importing them"""
+        start = time.perf_counter()
+        self.specs = self.discover()
+        self.discovery_seconds = time.perf_counter() - start
+        print(f"Discovered {len(self.specs)} agents in {self.discovery_seconds * 1000:.1f} ms")
+
+    def discover(self):
+        """Return {name: AgentSpec} for every agent currently on disk
+
+        Agent definitions (*.json) are parsed here; they are small and need
+        no import. Python agent modules are only scanned.
+        """
+        specs = {}
+        self.scan_errors = {}
+        manifest = os.path.join(self.agents_dir, MANIFEST_NAME)
+        if os.path.exists(manifest):
+            try:
+                manifest_specs = self.read_manifest(manifest)
+            except (OSError, ValueError) as e:
+                print(f"Error reading {manifest}: {e}")
+                self.scan_errors[manifest] = f"{type(e).__name__}: {e}"
+                manifest_specs = []
+            for spec in manifest_specs:
+                specs[spec.name] = spec
+        elif os.path.isdir(self.agents_dir):
+            for file_name in sorted(os.listdir(self.agents_dir)):
+                if file_name.startswith('_') or file_name == MANIFEST_NAME:
+                    continue
+                file_path = os.path.join(self.agents_dir, file_name)
+                if file_name.endswith('.json'):
+                    for spec in self._definition_specs(file_path):
+                        specs[spec.name] = spec
+                elif file_name.endswith('.py'):
+                    try:
+                        class_names = scan_agent_classes(file_path)
+                    except (OSError, ValueError) as e:
+                        print(f"Error scanning {file_path}: {e}")
+                        self.scan_errors[file_path] = str(e)
+                        continue
+                    for class_name in class_names:
+                        name = self.format_agent_name(class_name)
+                        specs[name] = AgentSpec(name, class_name, file_path)
+        return specs
+
+    def _definition_specs(self, file_path):
+        try:
+            definitions = load_definitions(file_path)
+        except (OSError, ValueError, TypeError) as e:
+            print(f"Error reading agent definitions from {file_path}: {e}")
+            self.scan_errors[file_path] = f"{type(e).__name__}: {e}"
+            return []
+        return [AgentSpec(definition.name, None, file_path, definition)
+                for definition in definitions]
+
+    def read_manifest(self, path):
+        """Agent specs from a manifest: {"agents": [{"file": ..., "class": ..., "name": ...}]}
+
+        An entry without "class" names a definitions file; all its agents are listed.
+        """
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+        entries = manifest.get('agents', []) if isinstance(manifest, dict) else None
+        if not isinstance(entries, list):
+            raise ValueError('Manifest must be an object with an "agents" list')
+        specs = []
+        for entry in entries:
+            if not isinstance(entry, dict) or not isinstance(entry.get('file'), str):
+                raise ValueError(f'Manifest entry without a "file": {entry!r}')
+            if not isinstance(entry.get('class', ''), str):
+                raise ValueError(f'Manifest entry with a bad "class": {entry!r}')
+            file_path = os.path.join(self.agents_dir, entry['file'])
+            if 'class' not in entry:
+                specs.extend(self._definition_specs(file_path))
+                continue
+            specs.append(AgentSpec(entry.get('name') or self.format_agent_name(entry['class']),
+                                   entry['class'], file_path))
+        return specs
+
+    def _specs(self):
+        if self.specs is None:
+            with self.lock:
+                if self.specs is None:
+                    self.load_agents()
+        return self.specs
+
     def load_agent_from_file(self, file_path):
-        """Load agent class from a Python file"""
+        """Import a Python file as a module"""
         module_name = os.path.splitext(os.path.basename(file_path))[0]
         spec = importlib.util.spec_from_file_location(module_name, file_path)
         module = importlib.util.module_from_spec(spec)
         spec.loader.exec_module(module)
-        
-        # Find agent classes in the module
-        for name, obj in inspect.getmembers(module):
-            if (inspect.isclass(obj) and 
-                name.endswith('Agent') and 
-                hasattr(obj, 'summarize_text')):
-                
-                agent_display_name = self.format_agent_name(name)
-                self.agent_classes[agent_display_name] = obj
-                print(f"Loaded agent: {agent_display_name}")
-    
+        return module
+
+    def get_agent_class(self, agent_name):
+        """An agent's definition, or its class (importing its module the first time)"""
+        agent_class = self.agent_classes.get(agent_name)
+        if agent_class is not None:
+            return agent_class
+        spec = self._specs().get(agent_name)
+        if spec is None:
+            return None
+        with self.lock:
+            if spec.definition is not None:
+                self.agent_classes[agent_name] = spec.definition
+            elif agent_name not in self.agent_classes:
+                start = time.perf_counter()
+                try:
+                    module = self.load_agent_from_file(spec.file_path)
+                    self.agent_classes[agent_name] = getattr(module, spec.class_name)
+                except Exception as e:
+                    print(f"Error loading {spec.file_path}: {e}")
+                    self.load_errors[agent_name] = str(e)
+                    return None
+                self.import_seconds[agent_name] = time.perf_counter() - start
+                self.load_errors.pop(agent_name, None)
+                print(f"Loaded agent: {agent_name}")
+        return self.agent_classes[agent_name]
+
     def format_agent_name(self, class_name):
         """Convert class name to display name"""
         # Convert CamelCase to Title Case
-        import re
         name = re.sub(r'([A-Z])', r' \1', class_name).strip()
         return name.replace('Agent', '').strip()
-    
+
     def get_agent_instance(self, agent_name):
         """Get or create agent instance"""
-        if agent_name not in self.agents:
-            if agent_name in self.agent_classes:
-                try:
-                    self.agents[agent_name] = self.agent_classes[agent_name]()
-                except Exception as e:
-                    print(f"Error creating {agent_name} instance: {e}")
-                    return None
+        agent = self.agents.get(agent_name)
+        if agent is not None:
+            return agent
+        with self.lock:
+            if agent_name not in self.agents:
+                agent_class = self.get_agent_class(agent_name)
+                if agent_class is not None:
+                    try:
+                        agent = self.build_agent(agent_class, agent_name)
+                        # A discovered class must be able to build a request, as on reload
+                        agent.create_request('Load check.')
+                    except Exception as e:
+                        print(f"Error creating {agent_name} instance: {e}")
+                        self.load_errors[agent_name] = str(e)
+                        return None
+                    self.agents[agent_name] = agent
         return self.agents.get(agent_name)
-    
+
+    def build_agent(self, agent_class, agent_name=None):
+        """Run a definition or an agent class on the shared engine
+
+        A subclass of Agent is instantiated with backend_pool=. Any other
+        class (a standalone agent like the original ones) only supplies its
+        prompt, model and options, which run on the engine as a definition
+        named agent_name; its own request code is not used.
+        """
+        if isinstance(agent_class, AgentDefinition):
+            return Agent(agent_class, backend_pool=self.backend_pool)
+        if issubclass(agent_class, Agent):
+            return agent_class(backend_pool=self.backend_pool)
+        definition = definition_from_class(agent_class, agent_name or agent_class.__name__)
+        return Agent(definition, backend_pool=self.backend_pool)
+
     def get_available_agents(self):
-        """Get list of available agent names"""
-        return list(self.agent_classes.keys())
\ No newline at end of file
+        """Get list of available agent names (from discovery alone, nothing is imported)"""
+        return list(self._specs().keys())
+
+    def stats(self):
+        """Discovery time, and which agents have been imported and how long each took"""
+        specs = self._specs()
+        return {
+            'agents_dir': self.agents_dir,
+            'discovered': len(specs),
+            'discovery_seconds': self.discovery_seconds,
+            'agents': [
+                dict(spec.to_dict(),
+                     loaded=name in self.agent_classes,
+                     import_seconds=self.import_seconds.get(name),
+                     error=self.load_errors.get(name))
+                for name, spec in specs.items()
+            ],
+            'scan_errors': {os.path.basename(path): error
+                            for path, error in self.scan_errors.items()},
+            'reload': {
+                'watching': self.watcher is not None and not self.watch_stop.is_set(),
+                'interval': self.watch_interval,
+                'counts': dict(self.reload_counts),
+                'events': list(self.reload_events),
+            },
+        }
+
+    def start_watcher(self, interval=DEFAULT_RELOAD_INTERVAL):
+        """Poll the agent sources and hot-reload changed agents in the background"""
+        if self.watcher is not None:
+            return
+        self._specs()
+        self.file_stamps = self._file_stamps()
+        self.watch_interval = interval
+
+        def loop():
+            while not self.watch_stop.wait(interval):
+                try:
+                    self.check_for_changes()
+                except Exception as e:
+                    print(f"Agent watcher error: {e}")
+
+        self.watcher = threading.Thread(target=loop, name='agent-reload', daemon=True)
+        self.watcher.start()
+
+    def stop_watcher(self):
+        self.watch_stop.set()
+
+    def _file_stamps(self):
+        """(mtime, size) of the manifest, every agent file and every .py/.json in the directory"""
+        paths = {spec.file_path for spec in self._specs().values()}
+        paths.add(os.path.join(self.agents_dir, MANIFEST_NAME))
+        if os.path.isdir(self.agents_dir):
+            paths.update(os.path.join(self.agents_dir, name)
+                         for name in os.listdir(self.agents_dir)
+                         if name.endswith(('.py', '.json')))
+        stamps = {}
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            stamps[path] = (stat.st_mtime_ns, stat.st_size)
+        return stamps
+
+    def check_for_changes(self):
+        """Apply source changes since the last check; returns the new reload events
+
+        Changed agents that are already loaded are re-imported (or re-read,
+        for definitions) and rebuilt, then swapped in. Requests holding the
+        old instance finish on it. An edit that fails to parse, import or
+        build is rejected and the last good version stays in service.
+        """
+        stamps = self._file_stamps()
+        changed = {path for path in set(stamps) | set(self.file_stamps)
+                   if stamps.get(path) != self.file_stamps.get(path)}
+        if not changed:
+            return []
+
+        events = []
+        with self.lock:
+            old_specs = self.specs or {}
+            specs = self.discover()
+            manifest = os.path.join(self.agents_dir, MANIFEST_NAME)
+            error = self.scan_errors.get(manifest)
+            if error is not None:
+                # Keep every agent as listed before. Only the manifest's stamp is
+                # recorded, so agent files edited meanwhile apply once it is fixed
+                if manifest in changed:
+                    self.file_stamps[manifest] = stamps.get(manifest)
+                    events.append(self._reload_event('rejected', None, manifest, error=error))
+                return events
+            # Recorded for rejected edits too, so they are reported once, not every poll
+            self.file_stamps = stamps
+            for name, spec in old_specs.items():
+                error = self.scan_errors.get(spec.file_path)
+                if error is not None and name not in specs:
+                    # Unreadable after an edit: keep serving the last good version
+                    specs[name] = spec
+                    if spec.file_path in changed:
+                        events.append(self._reload_event('rejected', name, spec.file_path,
+                                                         error=error))
+            for name in old_specs.keys() - specs.keys():
+                self.agent_classes.pop(name, None)
+                self.agents.pop(name, None)
+                events.append(self._reload_event('removed', name, old_specs[name].file_path))
+            for name in specs.keys() - old_specs.keys():
+                events.append(self._reload_event('added', name, specs[name].file_path))
+
+            modules = {}
+            for name, spec in specs.items():
+                if spec.file_path not in changed or name not in self.agent_classes:
+                    # Agents not loaded yet read the new source when first requested
+                    continue
+                if spec is old_specs.get(name):
+                    continue
+                start = time.perf_counter()
+                try:
+                    if spec.definition is not None:
+                        agent_class = spec.definition
+                    else:
+                        if spec.file_path not in modules:
+                            modules[spec.file_path] = self.load_agent_from_file(spec.file_path)
+                        agent_class = getattr(modules[spec.file_path], spec.class_name)
+                    agent = self.build_agent(agent_class, name)
+                    agent.create_request('Reload check.')
+                except Exception as e:
+                    print(f"Rejected reload of {name} from {spec.file_path}: {e}")
+                    events.append(self._reload_event('rejected', name, spec.file_path,
+                                                     error=f"{type(e).__name__}: {e}"))
+                    continue
+                # Swap class and instance together; new requests get the new version
+                self.agent_classes[name] = agent_class
+                if name in self.agents:
+                    self.agents[name] = agent
+                print(f"Reloaded agent: {name}")
+                events.append(self._reload_event('reloaded', name, spec.file_path,
+                                                 seconds=time.perf_counter() - start))
+            self.specs = specs
+        return events
+
+    def _reload_event(self, kind, name, file_path, error=None, seconds=None):
+        event = {'time': time.time(), 'event': kind, 'agent': name,
+                 'file': os.path.basename(file_path), 'error': error, 'seconds': seconds}
+        self.reload_counts[kind] += 1
+        self.reload_events.append(event)
+        return event
+
+    def get_map_reduce(self, agent_name, chunk_tokens=DEFAULT_CHUNK_TOKENS,
+                       concurrency=DEFAULT_CONCURRENCY, lane=INTERACTIVE):
+        """Get a chunked (map-reduce) summarizer for an agent; lane sets its admission priority"""
+        agent = self.get_agent_instance(agent_name)
+        if not agent:
+            return None
+        return MapReduceSummarizer(agent, chunk_tokens, concurrency, lane)
+
+    def summarize_chunked(self, agent_name, text, chunk_tokens=DEFAULT_CHUNK_TOKENS,
+                          concurrency=DEFAULT_CONCURRENCY):
+        """Summarize text of any length; returns (summary, timings) or None"""
+        summarizer = self.get_map_reduce(agent_name, chunk_tokens, concurrency)
+        if not summarizer:
+            return None
+        return summarizer.summarize(text)
@@ -0,0 +1,23 @@
+import re
+import uuid
+
+
+WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_text(text):
+    """Collapse whitespace and line breaks the way every agent expects its input"""
+    return WHITESPACE.sub(' ', text.strip())
+
+
+class SummaryRequest:
+    """Per-request state for one agent call, so agent instances can be shared"""
+
+    __slots__ = ('request_id', 'text', 'messages', 'payload', 'sizing')
+
+    def __init__(self, text, messages, payload, request_id=None, sizing=None):
+        self.request_id = request_id or str(uuid.uuid4())
+        self.text = text
+        self.messages = messages
+        self.payload = payload
+        self.sizing = sizing
@@ -0,0 +1,557 @@
+"""asyncio variant of app.py with the same routes and response formats.
+
+Generations are streamed from Ollama with an async HTTP client, so an open
+summary stream costs a coroutine rather than a worker thread. Run with an
+ASGI server, e.g.:
+
+    hypercorn async_app:app --bind 0.0.0.0:5000
+"""
+import asyncio
+import functools
+import json
+import os
+import uuid
+
+from quart import Quart, render_template, request, jsonify, session, Response
+
+from admission import Overloaded, get_admission
+from agent_manage import AgentManager
+from async_transport import AsyncOllamaTransport
+from backend_pool import BackendPool
+from batch import parse_workers, run_batch
+from conversation import ConversationBusy, follow_up_request, get_conversation_store
+from event_stream import SSE_HEADERS, AsyncEventLog, StreamRegistry, apump, parse_last_event_id
+from fanout import fan_out, oversized_agents
+from history_store import get_history_store, DEFAULT_PAGE_SIZE
+from map_reduce import parse_chunk_tokens
+from metrics import get_metrics, PROMETHEUS_CONTENT_TYPE
+from model_lifecycle import ModelLifecycle, base_url
+from segmenter import paragraph_segments
+from singleflight import (AsyncSingleFlight, DeadlineExceeded, FlightError, UpstreamUnavailable,
+                          parse_deadline)
+from sizing import OVERSIZE_POLICY, oversize_rejection, record_num_ctx
+from summary_cache import get_summary_cache
+
+app = Quart(__name__)
+# A fixed SECRET_KEY keeps client ids valid across restarts and workers
+app.secret_key = os.environ.get('SECRET_KEY') or os.urandom(24)
+
+
+# Optional multi-host Ollama pool (OLLAMA_BACKENDS); single host when unset
+backend_pool = BackendPool.from_env()
+if backend_pool:
+    backend_pool.start()
+
+# Initialize agent manager
+agent_manager = AgentManager(backend_pool=backend_pool)
+# AGENT_RELOAD=1 picks up edited agent files without a restart
+if os.environ.get('AGENT_RELOAD') == '1':
+    agent_manager.start_watcher()
+
+# Caps concurrent generations per backend and queues the rest by priority
+admission = get_admission()
+admission.configure(backend_pool=backend_pool)
+
+# Preload every agent's model and keep it loaded (OLLAMA_PRELOAD=0 to skip)
+model_lifecycle = ModelLifecycle(agent_manager, backend_pool)
+if os.environ.get('OLLAMA_PRELOAD', '1') != '0':
+    model_lifecycle.start()
+
+# Pooled async client shared by every open stream
+transport = AsyncOllamaTransport()
+
+# Deterministic (temperature 0) summaries are cached by prompt and input
+summary_cache = get_summary_cache()
+
+# Identical in-flight generations are coalesced into one upstream request
+single_flight = AsyncSingleFlight()
+
+# Event logs of recent streams, kept for Last-Event-ID resume; pump_tasks
+# holds the running pumps so they are not garbage collected mid-stream
+event_streams = StreamRegistry(AsyncEventLog)
+pump_tasks = set()
+
+# Summarization history, kept server-side and keyed by a small client id cookie
+history_store = get_history_store()
+
+# Summaries open for follow-up questions, with their messages as sent to Ollama
+conversations = get_conversation_store()
+
+
+@app.after_serving
+async def close_transport():
+    await transport.aclose()
+
+
+async def chat_chunks(agent, payload, stats=None, prefer=None):
+    """Stream content for a payload, routed through the backend pool if any
+
+    prefer is the host to go back to for a conversation's follow-ups.
+    """
+    lease = backend_pool.acquire(payload['model'], prefer) if backend_pool else None
+    ok = False
+    try:
+        url = lease.chat_url if lease else agent.url
+        if stats is not None:
+            stats.host = base_url(url)
+        record_num_ctx(payload)
+        async for chunk in transport.stream_chat(url, payload, agent.headers, stats):
+            yield chunk
+        ok = True
+    finally:
+        if lease:
+            lease.release(ok)
+
+
+def overloaded(error):
+    """429 with a Retry-After hint when no generation slot is free"""
+    return (jsonify({'error': str(error), 'retry_after': error.retry_after}), 429,
+            {'Retry-After': str(error.retry_after)})
+
+
+def client_id():
+    """Opaque per-browser id; the history itself lives server-side"""
+    if 'cid' not in session:
+        session['cid'] = uuid.uuid4().hex
+        # Drop the history list older versions kept in the cookie
+        session.pop('history', None)
+    return session['cid']
+
+
+@app.route('/')
+async def index():
+    """Main page"""
+    agents = agent_manager.get_available_agents()
+    return await render_template('index.html', agents=agents)
+
+
+@app.route('/summarize', methods=['POST'])
+async def summarize():
+    """Handle summarization request"""
+    try:
+        data = await request.get_json()
+        text = data.get('text', '').strip()
+        agent_name = data.get('agent', '')
+
+        if not text:
+            return jsonify({'error': 'No text provided'}), 400
+
+        if not agent_name:
+            return jsonify({'error': 'No agent selected'}), 400
+
+        agent = agent_manager.get_agent_instance(agent_name)
+        if not agent:
+            return jsonify({'error': f'Agent {agent_name} not found'}), 404
+
+        request_id = str(uuid.uuid4())
+        deadline = parse_deadline(data.get('deadline'))
+
+        chunked = bool(data.get('chunked'))
+        sizing = None
+        if not chunked:
+            summary_request = agent.create_request(text)
+            sizing = summary_request.sizing
+            if not sizing.fits:
+                rejection = oversize_rejection(sizing.to_dict())
+                if rejection is not None:
+                    return jsonify(rejection), 413
+                # Too long for the context window: summarize it in chunks instead
+                chunked = True
+
+        timings = None
+        stats = None
+        # Prompt of a successful single-pass summary, kept for follow-up questions
+        prompt = None
+        host = None
+        if chunked:
+            # The map stage fans out on its own thread pool
+            summarizer = agent_manager.get_map_reduce(
+                agent_name, chunk_tokens=parse_chunk_tokens(data.get('chunk_tokens')))
+            summary, timings = await asyncio.to_thread(summarizer.summarize, text, deadline)
+        else:
+            payload = summary_request.payload
+            # The cache's SQLite tier blocks, so it runs on a worker thread
+            summary = await asyncio.to_thread(summary_cache.get, payload)
+            if summary is not None:
+                stats = {'cached': True}
+                prompt = payload['messages']
+            else:
+                # Identical requests already running share one upstream generation
+                flight = single_flight.join(
+                    payload, functools.partial(chat_chunks, agent), agent_name)
+                try:
+                    summary = await flight.text(deadline)
+                    prompt, host = payload['messages'], flight.stats.host
+                except UpstreamUnavailable:
+                    summary = "Failed to get response from the API."
+                except FlightError as e:
+                    summary = f"Error during summarization: {e}"
+                stats = dict(flight.stats.to_dict(), cached=False)
+
+        # Store server-side for history; the cookie only carries the client id
+        await asyncio.to_thread(history_store.add, client_id(), request_id, agent_name, text, summary)
+        if prompt is not None:
+            # A single-pass summary can be followed up with POST /followup
+            conversations.start(request_id, client_id(), agent_name, prompt, summary, host)
+
+        result = {
+            'success': True,
+            'summary': summary,
+            'agent': agent_name,
+            'request_id': request_id,
+            'text_length': len(text)
+        }
+        if timings is not None:
+            result['timings'] = timings
+        if sizing is not None:
+            result['sizing'] = sizing.to_dict()
+        if data.get('stats') and stats is not None:
+            result['stats'] = stats
+        return jsonify(result)
+
+    except Overloaded as e:
+        return overloaded(e)
+    except DeadlineExceeded as e:
+        return jsonify({'error': str(e)}), 504
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/summarize_stream', methods=['POST'])
+async def summarize_stream():
+    try:
+        data = await request.get_json()
+        text = data.get('text', '').strip()
+        agent_name = data.get('agent', '')
+
+        if not text:
+            return jsonify({'error': 'No text provided'}), 400
+        if not agent_name:
+            return jsonify({'error': 'No agent selected'}), 400
+
+        agent = agent_manager.get_agent_instance(agent_name)
+        if not agent:
+            return jsonify({'error': f'Agent {agent_name} not found'}), 404
+
+        headers = {}
+        deadline = parse_deadline(data.get('deadline'))
+        chunked = bool(data.get('chunked'))
+        if not chunked:
+            summary_request = agent.create_request(text)
+            sizing = summary_request.sizing
+            if not sizing.fits:
+                rejection = oversize_rejection(sizing.to_dict())
+                if rejection is not None:
+                    return jsonify(rejection), 413
+                # Too long for the context window: summarize it in chunks instead
+                chunked = True
+            headers['X-Context-Sizing'] = json.dumps(sizing.to_dict())
+        if chunked:
+            # Map stage runs up front; only the final reduce pass is streamed
+            summarizer = agent_manager.get_map_reduce(
+                agent_name, chunk_tokens=parse_chunk_tokens(data.get('chunk_tokens')))
+            payload, timings = await asyncio.to_thread(summarizer.prepare, text, deadline)
+            headers['X-Map-Reduce-Timings'] = json.dumps(timings)
+        else:
+            payload = summary_request.payload
+
+        # Streamed results are recorded to history once the generation completes
+        cid = client_id()
+        request_id = str(uuid.uuid4())
+        headers['X-Request-Id'] = request_id
+
+        flight = None
+
+        async def record(summary):
+            await asyncio.to_thread(history_store.add, cid, request_id, agent_name, text, summary)
+            if not chunked:
+                conversations.start(request_id, cid, agent_name, payload['messages'], summary,
+                                    flight.stats.host if flight else None)
+
+        cached = await asyncio.to_thread(summary_cache.get, payload)
+        if cached is not None:
+            log = event_streams.create(request_id, cid)
+            # Replay the stored summary with the same segmentation as a live stream
+            for segment in paragraph_segments([cached]):
+                log.append('segment', segment)
+            await record(cached)
+            log.finish(cached=True)
+        else:
+            # Identical requests already running share one upstream generation;
+            # late subscribers get the output so far replayed, then the live tail
+            flight = single_flight.join(
+                payload, functools.partial(chat_chunks, agent), agent_name)
+
+            # Answer 429 now rather than inside the stream if no slot frees up
+            await flight.admission(deadline)
+            # Registered only once admitted: a 429 or 504 leaves no stream behind
+            log = event_streams.create(request_id, cid)
+
+            # The pump task follows the generation into the event log, so it
+            # survives a dropped connection and a client can resume with
+            # Last-Event-ID; it leaves the flight (stopping the generation if
+            # nobody else follows it) once no client has been attached for
+            # SSE_RESUME_GRACE seconds
+            task = asyncio.create_task(apump(log, flight, deadline, on_complete=record))
+            pump_tasks.add(task)
+            task.add_done_callback(pump_tasks.discard)
+
+        return Response(log.afollow(), mimetype='text/event-stream',
+                        headers=dict(SSE_HEADERS, **headers))
+
+    except Overloaded as e:
+        return overloaded(e)
+    except DeadlineExceeded as e:
+        return jsonify({'error': str(e)}), 504
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/summarize_stream/<stream_id>', methods=['GET'])
+async def resume_summary_stream(stream_id):
+    """Reattach to a stream, replaying the events after Last-Event-ID"""
+    log = event_streams.resume(stream_id, client_id())
+    if log is None:
+        return jsonify({'error': 'Stream not found or expired'}), 404
+    after_id = parse_last_event_id(
+        request.headers.get('Last-Event-ID') or request.args.get('last_event_id'))
+    return Response(log.afollow(after_id), mimetype='text/event-stream',
+                    headers=dict(SSE_HEADERS, **{'X-Request-Id': stream_id}))
+
+
+@app.route('/followup', methods=['POST'])
+async def follow_up():
+    """Ask a follow-up question about a /summarize result, keyed by its request_id
+
+    The conversation so far is resent as-is to the host that served it, so
+    Ollama reuses the already-evaluated prompt and only processes the question.
+    """
+    try:
+        data = await request.get_json()
+        text = data.get('text', '').strip()
+        request_id = data.get('request_id', '')
+
+        if not text:
+            return jsonify({'error': 'No text provided'}), 400
+
+        conversation = conversations.get(request_id, client_id())
+        if conversation is None:
+            return jsonify({'error': 'Conversation not found or expired'}), 404
+        agent = agent_manager.get_agent_instance(conversation.agent_name)
+        if not agent:
+            return jsonify({'error': f'Agent {conversation.agent_name} not found'}), 404
+
+        with conversations.turn(conversation):
+            messages, sizing, payload = follow_up_request(conversation, agent, text)
+            if not sizing.fits:
+                return jsonify({'error': 'The conversation is too long for the context window',
+                                'sizing': sizing.to_dict()}), 413
+
+            host = conversation.host
+            reply = await asyncio.to_thread(summary_cache.get, payload)
+            if reply is not None:
+                stats = {'cached': True}
+            else:
+                flight = single_flight.join(
+                    payload, functools.partial(chat_chunks, agent), conversation.agent_name,
+                    prefer=host)
+                try:
+                    reply = await flight.text(parse_deadline(data.get('deadline')))
+                except FlightError as e:
+                    return jsonify({'error': str(e)}), 502
+                stats = dict(flight.stats.to_dict(), cached=False)
+                host = flight.stats.host
+            conversations.extend(conversation, messages, reply, host)
+
+        result = {
+            'success': True,
+            'summary': reply,
+            'agent': conversation.agent_name,
+            'request_id': request_id,
+            'turn': conversation.turns,
+            'sizing': sizing.to_dict(),
+        }
+        if data.get('stats'):
+            result['stats'] = stats
+        return jsonify(result)
+
+    except ConversationBusy as e:
+        return jsonify({'error': str(e)}), 409
+    except Overloaded as e:
+        return overloaded(e)
+    except DeadlineExceeded as e:
+        return jsonify({'error': str(e)}), 504
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/summarize_batch', methods=['POST'])
+async def summarize_batch():
+    """Summarize many items, streaming one NDJSON result line per finished item"""
+    try:
+        data = await request.get_json()
+        items = data.get('items')
+        if not isinstance(items, list) or not items:
+            return jsonify({'error': 'No items provided'}), 400
+
+        # Reject a bad worker count now, before the 200 and the stream start
+        try:
+            workers = parse_workers(data.get('workers'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        results = run_batch(agent_manager, items, workers)
+
+        async def ndjson_stream():
+            # The batch runs on its own bounded thread pool; only wait for it here
+            try:
+                while True:
+                    result = await asyncio.to_thread(next, results, None)
+                    if result is None:
+                        break
+                    yield json.dumps(result) + '\n'
+            finally:
+                try:
+                    results.close()
+                except ValueError:
+                    # Still running in its worker thread; it stops at the next yield
+                    pass
+
+        return Response(ndjson_stream(), mimetype='application/x-ndjson')
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/summarize_multi', methods=['POST'])
+async def summarize_multi():
+    """Run several agents on one text concurrently as one tagged NDJSON stream"""
+    try:
+        data = await request.get_json()
+        text = data.get('text', '').strip()
+        agent_names = data.get('agents') or agent_manager.get_available_agents()
+
+        if not text:
+            return jsonify({'error': 'No text provided'}), 400
+        if not isinstance(agent_names, list):
+            return jsonify({'error': 'agents must be a list'}), 400
+        agent_names = list(dict.fromkeys(agent_names))
+
+        chunked = bool(data.get('chunked'))
+        if not chunked and OVERSIZE_POLICY == 'reject':
+            oversized = oversized_agents(agent_manager, text, agent_names)
+            if oversized:
+                return jsonify(oversize_rejection(oversized)), 413
+
+        events = fan_out(agent_manager, text, agent_names, parse_deadline(data.get('deadline')),
+                         chunked, parse_chunk_tokens(data.get('chunk_tokens')))
+
+        async def ndjson_stream():
+            try:
+                while True:
+                    event = await asyncio.to_thread(next, events, None)
+                    if event is None:
+                        break
+                    yield json.dumps(event) + '\n'
+            finally:
+                try:
+                    events.close()
+                except ValueError:
+                    # Still running in its worker thread; it stops at the next yield
+                    pass
+
+        return Response(ndjson_stream(), mimetype='application/x-ndjson')
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/metrics')
+async def metrics():
+    """Per-agent, per-model generation metrics in Prometheus text format"""
+    return Response(get_metrics().render(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+@app.route('/agent_stats')
+async def agent_stats():
+    """Discovered agents, which are imported yet, and discovery/import times"""
+    return jsonify(agent_manager.stats())
+
+@app.route('/transport_stats')
+async def transport_stats():
+    """Connection pool and timeout metrics for the Ollama backends"""
+    return jsonify(transport.pool_stats())
+
+@app.route('/backend_stats')
+async def backend_stats():
+    """Per-host health, models, in-flight generations and latency"""
+    if not backend_pool:
+        return jsonify({'backends': []})
+    return jsonify(backend_pool.stats())
+
+@app.route('/admission_stats')
+async def admission_stats():
+    """Generation slots in use, queue depth and admission counts per lane"""
+    return jsonify(admission.stats())
+
+@app.route('/stream_stats')
+async def stream_stats():
+    """Resumable streams held for Last-Event-ID replay and how often they were resumed"""
+    return jsonify(event_streams.stats())
+
+@app.route('/conversation_stats')
+async def conversation_stats():
+    """Summaries open for follow-up questions, their memory use and evictions"""
+    return jsonify(conversations.stats())
+
+@app.route('/model_stats')
+async def model_stats():
+    """Agent models, where they are loaded, their keep_alive and warm-up history"""
+    return jsonify(await asyncio.to_thread(model_lifecycle.stats))
+
+@app.route('/cache_stats')
+async def cache_stats():
+    """Hit/miss counters and size of the summary cache"""
+    stats = await asyncio.to_thread(summary_cache.stats)
+    stats['single_flight'] = single_flight.stats()
+    return jsonify(stats)
+
+@app.route('/history')
+async def history():
+    """Get summarization history, newest first, one page per cursor"""
+    try:
+        entries, next_cursor = await asyncio.to_thread(
+            history_store.page,
+            client_id(),
+            cursor=request.args.get('cursor') or None,
+            limit=request.args.get('limit', DEFAULT_PAGE_SIZE),
+        )
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor or limit'}), 400
+    return jsonify({'items': entries, 'next_cursor': next_cursor})
+
+@app.route('/history/search')
+async def search_history():
+    """Full-text search over history, best matches first, with highlighted snippets"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'No search query provided'}), 400
+    try:
+        entries, next_cursor = await asyncio.to_thread(
+            history_store.search,
+            client_id(),
+            query,
+            cursor=request.args.get('cursor') or None,
+            limit=request.args.get('limit', DEFAULT_PAGE_SIZE),
+        )
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor or limit'}), 400
+    return jsonify({'items': entries, 'next_cursor': next_cursor})
+
+@app.route('/clear_history', methods=['POST'])
+async def clear_history():
+    """Clear summarization history"""
+    await asyncio.to_thread(history_store.clear, client_id())
+    return jsonify({'success': True})
+
+if __name__ == '__main__':
+    app.run(debug=True, host='0.0.0.0', port=5000)
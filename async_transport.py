@@ -0,0 +1,87 @@
+import time
+from urllib.parse import urlsplit
+
+import httpx
+
+from transport import (
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_READ_TIMEOUT,
+    DEFAULT_POOL_MAXSIZE,
+    HostStats,
+)
+from ollama_stream import chat_content
+
+
+class AsyncTransportError(Exception):
+    """Raised when the backend refuses or fails a chat request"""
+
+
+class AsyncOllamaTransport:
+    """asyncio counterpart of OllamaTransport built on a pooled httpx client"""
+
+    def __init__(self,
+                 connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout=DEFAULT_READ_TIMEOUT,
+                 max_connections=DEFAULT_POOL_MAXSIZE * 8):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_connections = max_connections
+        self.stats = {}
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+        )
+
+    def _host_stats(self, host):
+        stats = self.stats.get(host)
+        if stats is None:
+            stats = self.stats[host] = HostStats()
+        return stats
+
+    async def stream_chat(self, url, payload, headers=None, generation=None):
+        """Yield message content from an Ollama /api/chat NDJSON stream
+
+        generation (a GenerationStats) picks up the timings of the final record.
+        """
+        stats = self._host_stats(urlsplit(url).netloc)
+        stats.requests += 1
+        stats.in_flight += 1
+        start = time.perf_counter()
+        try:
+            async with self.client.stream('POST', url, json=payload, headers=headers) as response:
+                stats.total_connect_seconds += time.perf_counter() - start
+                if response.status_code != 200:
+                    stats.errors += 1
+                    body = await response.aread()
+                    raise AsyncTransportError(
+                        f"API Error: {response.status_code} - {body.decode('utf-8', 'replace')}"
+                    )
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    content = chat_content(line, generation)
+                    if content:
+                        yield content
+        except httpx.TimeoutException:
+            stats.timeouts += 1
+            stats.errors += 1
+            raise
+        except httpx.HTTPError:
+            stats.errors += 1
+            raise
+        finally:
+            stats.in_flight -= 1
+
+    def pool_stats(self):
+        return {
+            'connect_timeout': self.connect_timeout,
+            'read_timeout': self.read_timeout,
+            'max_connections': self.max_connections,
+            'hosts': {host: stats.to_dict() for host, stats in self.stats.items()},
+        }
+
+    async def aclose(self):
+        await self.client.aclose()
@@ -0,0 +1,171 @@
+import os
+import threading
+import time
+
+import requests
+
+from transport import get_transport
+
+
+DEFAULT_HEALTH_INTERVAL = float(os.environ.get('OLLAMA_HEALTH_INTERVAL', 15))
+HEALTH_TIMEOUT = (2, 5)
+# Weight of the newest sample in the per-host latency moving average
+LATENCY_ALPHA = 0.2
+
+
+def model_key(model):
+    """Ollama reports 'llama3.2:latest' for a model requested as 'llama3.2'"""
+    return model if ':' in model else f"{model}:latest"
+
+
+class Backend:
+    """One Ollama endpoint with its health, models and load counters"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.chat_url = f"{self.base_url}/api/chat"
+        self.healthy = True
+        self.models = None  # unknown until the first health check
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.latency = None
+        self.last_check = None
+        self.last_error = None
+
+    def has_model(self, model):
+        return self.models is None or model_key(model) in self.models
+
+    def to_dict(self):
+        return {
+            'url': self.base_url,
+            'healthy': self.healthy,
+            'models': sorted(self.models) if self.models is not None else None,
+            'in_flight': self.in_flight,
+            'requests': self.requests,
+            'errors': self.errors,
+            'avg_latency_seconds': self.latency,
+            'last_check': self.last_check,
+            'last_error': self.last_error,
+        }
+
+
+class BackendLease:
+    """A routed request slot on one backend; release exactly once"""
+
+    def __init__(self, pool, backend):
+        self.pool = pool
+        self.backend = backend
+        self.chat_url = backend.chat_url
+        self.started = time.perf_counter()
+        self.released = False
+
+    def release(self, ok=True):
+        if not self.released:
+            self.released = True
+            self.pool.release(self.backend, time.perf_counter() - self.started, ok)
+
+
+class BackendPool:
+    """Route generations to the least-loaded healthy Ollama host serving the model"""
+
+    def __init__(self, endpoints, health_interval=DEFAULT_HEALTH_INTERVAL):
+        if not endpoints:
+            raise ValueError('BackendPool needs at least one endpoint')
+        self.backends = [Backend(url) for url in endpoints]
+        self.health_interval = health_interval
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    @classmethod
+    def from_env(cls):
+        """Build a pool from OLLAMA_BACKENDS (comma separated URLs), or None"""
+        endpoints = [url.strip() for url in os.environ.get('OLLAMA_BACKENDS', '').split(',')
+                     if url.strip()]
+        return cls(endpoints) if endpoints else None
+
+    def check(self, backend):
+        """Refresh one backend's health and model list from /api/tags"""
+        try:
+            response = get_transport().get(f"{backend.base_url}/api/tags", timeout=HEALTH_TIMEOUT)
+            response.raise_for_status()
+            models = {model_key(m['name']) for m in response.json().get('models', [])}
+            with self.lock:
+                backend.models = models
+                backend.healthy = True
+                backend.last_error = None
+        except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+            with self.lock:
+                backend.healthy = False
+                backend.last_error = str(e)
+        backend.last_check = time.time()
+
+    def check_all(self):
+        for backend in self.backends:
+            self.check(backend)
+
+    def start(self):
+        """Run an initial health check and keep checking in the background"""
+        if self.thread is not None:
+            return
+        self.check_all()
+
+        def loop():
+            while not self.stop_event.wait(self.health_interval):
+                self.check_all()
+
+        self.thread = threading.Thread(target=loop, name='backend-health', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def candidates(self, model):
+        """The backends a generation for model may go to, healthy ones first"""
+        healthy = [b for b in self.backends if b.healthy and b.has_model(model)]
+        # Nothing known-good: try any host serving the model rather than fail outright
+        return healthy or [b for b in self.backends if b.has_model(model)] or self.backends
+
+    def acquire(self, model, prefer=None):
+        """Lease the healthy backend with the fewest in-flight generations for a model
+
+        prefer (a base URL) wins whenever it is one of the candidates; the
+        admission controller passes the host it reserved a slot on.
+        """
+        with self.lock:
+            candidates = self.candidates(model)
+            preferred = [b for b in candidates if b.base_url == prefer]
+            if preferred:
+                candidates = preferred
+            backend = min(
+                candidates,
+                key=lambda b: (b.in_flight, b.latency if b.latency is not None else 0.0),
+            )
+            backend.in_flight += 1
+            backend.requests += 1
+        return BackendLease(self, backend)
+
+    def release(self, backend, seconds, ok):
+        with self.lock:
+            backend.in_flight -= 1
+            if ok:
+                if backend.latency is None:
+                    backend.latency = seconds
+                else:
+                    backend.latency += LATENCY_ALPHA * (seconds - backend.latency)
+            else:
+                backend.errors += 1
+
+    def mark_down(self, backend, error):
+        """Take a backend out of rotation until its next successful health check"""
+        with self.lock:
+            backend.healthy = False
+            backend.last_error = str(error)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'health_interval': self.health_interval,
+                'backends': [backend.to_dict() for backend in self.backends],
+            }
@@ -0,0 +1,88 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from admission import BATCH, Overloaded
+
+
+DEFAULT_BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', 4))
+MAX_BATCH_WORKERS = int(os.environ.get('BATCH_MAX_WORKERS', 16))
+
+
+def parse_workers(value):
+    """Validate a client-supplied worker count; raises ValueError if it is not a number"""
+    if value is None or value == '':
+        return DEFAULT_BATCH_WORKERS
+    if isinstance(value, bool):
+        raise ValueError('workers must be a number')
+    try:
+        workers = int(value)
+    except (TypeError, ValueError):
+        raise ValueError('workers must be a number') from None
+    return max(1, min(workers, MAX_BATCH_WORKERS))
+
+
+def summarize_item(agent_manager, index, item):
+    """Summarize one batch item; never raises, errors are reported per item"""
+    start = time.perf_counter()
+    result = {'index': index, 'id': index}
+    try:
+        if not isinstance(item, dict):
+            raise ValueError('Item must be an object with text and agent')
+        result['id'] = item.get('id', index)
+        text = str(item.get('text') or '').strip()
+        agent_name = item.get('agent', '')
+        result['agent'] = agent_name
+        if not text:
+            raise ValueError('No text provided')
+        if not agent_name:
+            raise ValueError('No agent selected')
+
+        # Batch generations queue behind interactive ones for free slots
+        summarizer = agent_manager.get_map_reduce(agent_name, lane=BATCH)
+        if not summarizer:
+            raise ValueError(f'Agent {agent_name} not found')
+
+        summary, timings = summarizer.summarize(text)
+        result.update({
+            'success': True,
+            'summary': summary,
+            'text_length': len(text),
+            'timings': timings,
+        })
+    except Overloaded as e:
+        result.update({'success': False, 'error': str(e), 'retry_after': e.retry_after})
+    except Exception as e:
+        result.update({'success': False, 'error': str(e)})
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def run_batch(agent_manager, items, workers=DEFAULT_BATCH_WORKERS):
+    """Yield one result per item, in completion order
+
+    At most `workers` items are in flight and only as many results as are
+    running are held at once, so memory does not grow with the batch size.
+    workers is checked right away, before the first result is asked for.
+    """
+    return _run_batch(agent_manager, items, parse_workers(workers))
+
+
+def _run_batch(agent_manager, items, workers):
+    executor = ThreadPoolExecutor(max_workers=workers)
+    pending = set()
+    try:
+        for index, item in enumerate(items):
+            if len(pending) >= workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+            pending.add(executor.submit(summarize_item, agent_manager, index, item))
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    finally:
+        # A client that goes away mid-batch should not leave queued items running
+        executor.shutdown(wait=False, cancel_futures=True)
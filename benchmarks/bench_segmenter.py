@@ -0,0 +1,110 @@
+"""Micro-benchmark: incremental StreamSegmenter vs the original regex splitter.
+
+The original paragraph_stream re-ran its regex from the start of the
+buffer on every token, which is quadratic or worse for long stretches without
+sentence punctuation (Mermaid diagrams, code blocks).
+
+    python benchmarks/bench_segmenter.py --tokens 2000
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from segmenter import StreamSegmenter  # noqa: E402
+
+
+def legacy_segments(chunks):
+    """The regex segmentation paragraph_stream used before StreamSegmenter"""
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk
+        while True:
+            match = re.search(r'(.+?)([\n]{2,}|[.!?])(\s|$)', buffer)
+            if not match:
+                break
+            segment = match.group(1) + match.group(2)
+            yield segment.strip()
+            buffer = buffer[match.end():]
+    if buffer.strip():
+        yield buffer.strip()
+
+
+def incremental_segments(chunks):
+    segmenter = StreamSegmenter(max_chars=sys.maxsize)
+    for chunk in chunks:
+        yield from segmenter.feed(chunk)
+    yield from segmenter.flush()
+
+
+def tokenize(text, size=4):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def make_prose(tokens):
+    sentence = "The model reads the chapter and writes a short summary of each idea. "
+    return tokenize((sentence * (tokens * 4 // len(sentence) + 1))[:tokens * 4])
+
+
+def make_mermaid(tokens):
+    lines = [f"    N{i}[Concept {i}] --> N{i + 1}[Concept {i + 1}]\n" for i in range(tokens)]
+    return tokenize(("graph TD\n" + ''.join(lines))[:tokens * 4])
+
+
+def make_code(tokens):
+    body = ''.join(f"    value_{i} = compute(value_{i - 1}, step={i})\n" for i in range(1, tokens))
+    return tokenize(("```python\n" + body)[:tokens * 4] + "\n```\n")
+
+
+WORKLOADS = {
+    'prose': make_prose,
+    'mermaid': make_mermaid,
+    'code': make_code,
+}
+
+IMPLEMENTATIONS = {
+    'regex': legacy_segments,
+    'incremental': incremental_segments,
+}
+
+
+def measure(fn, chunks, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in fn(chunks):
+            pass
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(tokens, repeat):
+    """Return {workload: {implementation: seconds}}"""
+    results = {}
+    for workload, make in WORKLOADS.items():
+        chunks = make(tokens)
+        results[workload] = {
+            name: measure(fn, chunks, repeat) for name, fn in IMPLEMENTATIONS.items()
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tokens', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{args.tokens} tokens per workload, best of {args.repeat}")
+    for workload, timings in run(args.tokens, args.repeat).items():
+        regex, incremental = timings['regex'], timings['incremental']
+        print(f"{workload:>8}: regex {regex * 1000:9.2f} ms   "
+              f"incremental {incremental * 1000:8.2f} ms   "
+              f"speedup {regex / incremental:7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,442 @@
+"""Stand-in for Ollama's HTTP API with tunable latency, speed and failures.
+
+Streams /api/chat replies in Ollama's NDJSON format (or one JSON object
+when "stream" is false), ending with the usual final record carrying
+eval_count, eval_duration and friends. /api/tags lists the configured
+models so the backend pool's health checks pass.
+
+With --load-seconds, models start unloaded: the first request for a model
+pays the load time (reported as load_duration) and the model then stays
+resident for the request's keep_alive (default --keep-alive seconds).
+A request with a different num_ctx than the loaded one reloads it.
+/api/ps lists resident models with their expiry, and a chat request
+without messages only loads (or, with keep_alive 0, unloads) the model,
+as Ollama does.
+
+With --prompt-tokens-per-sec, prompt evaluation takes time too, and each
+model keeps the last --parallel prompts (plus their replies) evaluated,
+like Ollama's per-slot KV cache: a request that starts with one of them
+only pays for the rest, and prompt_eval_count counts only that rest.
+A different num_ctx reloads the model and drops its cache.
+
+    python benchmarks/fake_ollama.py --port 11434 --ttft 0.3 --tokens-per-sec 40
+    python benchmarks/fake_ollama.py --error-rate 0.05 --stall-rate 0.1 --stall-seconds 5
+
+Point the app at it with OLLAMA_BACKENDS=http://127.0.0.1:<port>, or run
+it on 11434 in place of a real Ollama.
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeOllamaConfig:
+    """Behaviour knobs; read on every request so tests can change them live"""
+
+    def __init__(self, ttft=0.2, tokens_per_sec=50.0, reply_tokens=80, jitter=0.1,
+                 error_rate=0.0, stall_rate=0.0, stall_seconds=5.0,
+                 models=('llama3.2:latest',), seed=None, load_seconds=0.0,
+                 keep_alive=300.0, prompt_tokens_per_sec=0.0, parallel=4):
+        self.ttft = ttft
+        self.tokens_per_sec = tokens_per_sec
+        self.reply_tokens = reply_tokens
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.stall_rate = stall_rate
+        self.stall_seconds = stall_seconds
+        self.models = list(models)
+        self.load_seconds = load_seconds
+        self.keep_alive = keep_alive
+        self.prompt_tokens_per_sec = prompt_tokens_per_sec
+        self.parallel = parallel
+        # model -> (num_ctx, rendered prompts whose KV cache is kept)
+        self.prompt_cache = {}
+        # model -> expiry (time.time()), None while pinned with a negative keep_alive
+        self.resident = {}
+        # model -> num_ctx it was loaded with
+        self.loaded_ctx = {}
+        self.load_lock = threading.Lock()
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counters = {'requests': 0, 'errors': 0, 'stalls': 0, 'active': 0, 'loads': 0,
+                         'prompt_tokens': 0, 'cached_prompt_tokens': 0}
+
+    def roll(self, rate):
+        with self.lock:
+            return self.random.random() < rate
+
+    def pick(self, count):
+        with self.lock:
+            return self.random.randrange(max(1, count))
+
+    def jittered(self, seconds):
+        with self.lock:
+            return max(0.0, seconds * (1 + self.random.uniform(-self.jitter, self.jitter)))
+
+    def count(self, name, delta=1):
+        with self.lock:
+            self.counters[name] += delta
+
+    def is_resident(self, model, now):
+        if self.load_seconds <= 0:
+            return True
+        expires = self.resident.get(model, 0)
+        return expires is None or expires > now
+
+    def load(self, model, keep_alive, num_ctx=None):
+        """Make the model resident; returns the seconds spent loading it (0 when warm)"""
+        seconds = 0.0
+        num_ctx = num_ctx or DEFAULT_NUM_CTX
+        # One load at a time, like a single GPU; waiters find the model warm
+        with self.load_lock:
+            if (not self.is_resident(model, time.time()) or
+                    self.load_seconds > 0 and self.loaded_ctx.get(model) != num_ctx):
+                self.loaded_ctx[model] = num_ctx
+                seconds = self.jittered(self.load_seconds)
+                time.sleep(seconds)
+                self.count('loads')
+            self.set_keep_alive(model, keep_alive)
+        return seconds
+
+    def set_keep_alive(self, model, keep_alive):
+        seconds = parse_keep_alive(keep_alive, self.keep_alive)
+        with self.lock:
+            if seconds == 0:
+                self.resident.pop(model, None)
+            else:
+                self.resident[model] = None if seconds < 0 else time.time() + seconds
+
+    def cached_prefix(self, model, num_ctx, text):
+        """Characters at the start of a rendered prompt that some slot already evaluated"""
+        with self.lock:
+            cached = self.prompt_cache.get(model)
+            if cached is None or cached[0] != num_ctx:
+                return 0
+            return max((common_prefix(text, other) for other in cached[1]), default=0)
+
+    def remember_prompt(self, model, num_ctx, text):
+        """Keep a finished prompt and reply evaluated, in the slot it continued if any"""
+        with self.lock:
+            cached = self.prompt_cache.get(model)
+            if cached is None or cached[0] != num_ctx:
+                cached = self.prompt_cache[model] = (num_ctx, deque(maxlen=max(1, self.parallel)))
+            slots = cached[1]
+            for other in list(slots):
+                if text.startswith(other):
+                    slots.remove(other)
+            slots.append(text)
+
+    def running(self):
+        """(model, expiry) for every resident model, as /api/ps lists them"""
+        now = time.time()
+        if self.load_seconds <= 0:
+            return [(name, None) for name in self.models]
+        with self.lock:
+            return [(name, expires) for name, expires in self.resident.items()
+                    if expires is None or expires > now]
+
+
+DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)(ms|s|m|h)')
+DURATION_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+
+
+def parse_keep_alive(value, default):
+    """Seconds for an Ollama keep_alive: a number of seconds or a duration like '10m'"""
+    if value is None or value == '':
+        return default
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip()
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    sign = -1 if text.startswith('-') else 1
+    parts = DURATION_PART.findall(text.lstrip('-'))
+    if not parts:
+        return default
+    return sign * sum(float(number) * DURATION_UNITS[unit] for number, unit in parts)
+
+
+def common_prefix(a, b):
+    """Length of the longest common prefix of two strings"""
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[:middle] == b[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def render_prompt(messages):
+    """Messages as one string, the way a chat template lays them out for the model"""
+    return ''.join(f"<|{m.get('role', '')}|>{m.get('content', '')}<|end|>" for m in messages)
+
+
+# Ollama's context window when a request sets no num_ctx
+DEFAULT_NUM_CTX = 2048
+
+
+def model_key(model):
+    return model if ':' in model else f"{model}:latest"
+
+
+WORDS = ('the model reads each section and writes a short summary of the key ideas '
+         'so readers can skim the result quickly').split()
+
+
+def reply_tokens(prompt, count):
+    """Deterministic pseudo-reply: echoes a few prompt words, then filler"""
+    words = prompt.split()[:8] + list(WORDS)
+    return [words[i % len(words)] + ' ' for i in range(count)]
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    config = None  # set by make_server
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == '/api/tags':
+            self.send_json(200, {'models': [{'name': name, 'model': name}
+                                            for name in self.config.models]})
+        elif self.path == '/api/ps':
+            self.send_json(200, {'models': [
+                {'name': name, 'model': name, 'size_vram': 0,
+                 'expires_at': time.strftime('%Y-%m-%dT%H:%M:%SZ',
+                                             time.gmtime(expires or 4102444800))}
+                for name, expires in self.config.running()]})
+        elif self.path == '/stats':
+            with self.config.lock:
+                self.send_json(200, dict(self.config.counters))
+        else:
+            self.send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        if self.path != '/api/chat':
+            self.send_json(404, {'error': 'not found'})
+            return
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            payload = json.loads(self.rfile.read(length))
+        except ValueError:
+            self.send_json(400, {'error': 'invalid JSON'})
+            return
+
+        config = self.config
+        config.count('requests')
+        if config.roll(config.error_rate):
+            config.count('errors')
+            self.send_json(500, {'error': 'fake backend error'})
+            return
+
+        config.count('active')
+        try:
+            self.generate(config, payload)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client went away mid-stream
+        finally:
+            config.count('active', -1)
+
+    def generate(self, config, payload):
+        started = time.perf_counter()
+        model = payload.get('model', '')
+        if not payload.get('messages'):
+            self.load_only(config, payload, model, started)
+            return
+        options = payload.get('options') or {}
+        load_seconds = config.load(model_key(model), payload.get('keep_alive'),
+                                   options.get('num_ctx'))
+        messages = payload['messages']
+        rendered = render_prompt(messages)
+        num_ctx = options.get('num_ctx')
+        cached_chars = config.cached_prefix(model_key(model), num_ctx, rendered)
+        # ~4 characters per token; at least the last token is always evaluated
+        prompt_count = max(1, (len(rendered) - cached_chars) // 4)
+        config.count('prompt_tokens', prompt_count)
+        config.count('cached_prompt_tokens', cached_chars // 4)
+        # num_predict caps the reply as in Ollama; negative values mean no cap
+        count = config.reply_tokens
+        num_predict = int(options.get('num_predict') or 0)
+        if num_predict > 0:
+            count = min(count, num_predict)
+        tokens = reply_tokens(messages[-1].get('content', ''), count)
+        stall_at = config.pick(count) if config.roll(config.stall_rate) else None
+        if stall_at is not None:
+            config.count('stalls')
+
+        if config.prompt_tokens_per_sec > 0:
+            time.sleep(prompt_count / config.prompt_tokens_per_sec)
+        time.sleep(config.jittered(config.ttft))
+        first_token = time.perf_counter()
+        stream = payload.get('stream', True)
+        if stream:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-ndjson')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+
+        interval = 1.0 / config.tokens_per_sec if config.tokens_per_sec > 0 else 0.0
+        for i, token in enumerate(tokens):
+            if i == stall_at:
+                time.sleep(config.stall_seconds)
+            if i and interval:
+                time.sleep(config.jittered(interval))
+            if stream:
+                self.write_record({'model': model, 'message': {'role': 'assistant',
+                                                               'content': token},
+                                   'done': False})
+
+        finished = time.perf_counter()
+        config.remember_prompt(model_key(model), num_ctx, rendered + render_prompt(
+            [{'role': 'assistant', 'content': ''.join(tokens)}]))
+        final = {
+            'model': model,
+            'message': {'role': 'assistant', 'content': '' if stream else ''.join(tokens)},
+            'done': True,
+            'done_reason': 'length' if 0 < num_predict < config.reply_tokens else 'stop',
+            'total_duration': int((finished - started) * 1e9),
+            'load_duration': int(load_seconds * 1e9),
+            'prompt_eval_count': prompt_count,
+            'prompt_eval_duration': int((first_token - started) * 1e9),
+            'eval_count': len(tokens),
+            'eval_duration': int((finished - first_token) * 1e9),
+        }
+        if stream:
+            self.write_record(final)
+            self.wfile.write(b'0\r\n\r\n')
+        else:
+            self.send_json(200, final)
+
+    def load_only(self, config, payload, model, started):
+        """Answer a request without messages: load the model, or unload it for keep_alive 0"""
+        keep_alive = payload.get('keep_alive')
+        if parse_keep_alive(keep_alive, config.keep_alive) == 0:
+            config.set_keep_alive(model_key(model), 0)
+            load_seconds, reason = 0.0, 'unload'
+        else:
+            num_ctx = (payload.get('options') or {}).get('num_ctx')
+            load_seconds, reason = config.load(model_key(model), keep_alive, num_ctx), 'load'
+        record = {'model': model, 'message': {'role': 'assistant', 'content': ''},
+                  'done': True, 'done_reason': reason,
+                  'total_duration': int((time.perf_counter() - started) * 1e9),
+                  'load_duration': int(load_seconds * 1e9)}
+        if payload.get('stream', True):
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-ndjson')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            self.write_record(record)
+            self.wfile.write(b'0\r\n\r\n')
+        else:
+            self.send_json(200, record)
+
+    def write_record(self, record):
+        # Compact, like Ollama's own encoder
+        line = json.dumps(record, separators=(',', ':')).encode('utf-8') + b'\n'
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(line), line))
+        self.wfile.flush()
+
+
+class FakeOllamaServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 refuses connections under load tests
+    request_queue_size = 512
+
+
+def make_server(config, host='127.0.0.1', port=0):
+    """Build (not start) a threaded fake Ollama server"""
+    handler = type('Handler', (FakeOllamaHandler,), {'config': config})
+    return FakeOllamaServer((host, port), handler)
+
+
+def start_server(config, host='127.0.0.1', port=0):
+    """Serve in a daemon thread and return the server; its URL is base_url(server)"""
+    server = make_server(config, host, port)
+    threading.Thread(target=server.serve_forever, name='fake-ollama', daemon=True).start()
+    return server
+
+
+def base_url(server):
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}"
+
+
+def add_arguments(parser):
+    parser.add_argument('--ttft', type=float, default=0.2,
+                        help='seconds before the first token')
+    parser.add_argument('--tokens-per-sec', type=float, default=50.0)
+    parser.add_argument('--reply-tokens', type=int, default=80,
+                        help='tokens per reply, or num_predict if the request sets a lower one')
+    parser.add_argument('--jitter', type=float, default=0.1,
+                        help='random +/- fraction applied to every delay')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='fraction of requests answered with HTTP 500')
+    parser.add_argument('--stall-rate', type=float, default=0.0,
+                        help='fraction of streams that pause once mid-reply')
+    parser.add_argument('--stall-seconds', type=float, default=5.0)
+    parser.add_argument('--model', action='append', dest='models',
+                        help='model to advertise (repeatable, default llama3.2:latest)')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--load-seconds', type=float, default=0.0,
+                        help='model load time on a cold request (0 = always loaded)')
+    parser.add_argument('--keep-alive', type=float, default=300.0,
+                        help='seconds a model stays loaded when the request sets no keep_alive')
+    parser.add_argument('--prompt-tokens-per-sec', type=float, default=0.0,
+                        help='prompt evaluation speed for uncached tokens (0 = free)')
+    parser.add_argument('--parallel', type=int, default=4,
+                        help='prompts kept evaluated per model, like OLLAMA_NUM_PARALLEL')
+
+
+def config_from_args(args):
+    return FakeOllamaConfig(
+        ttft=args.ttft,
+        tokens_per_sec=args.tokens_per_sec,
+        reply_tokens=args.reply_tokens,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        stall_rate=args.stall_rate,
+        stall_seconds=args.stall_seconds,
+        models=args.models or ('llama3.2:latest',),
+        seed=args.seed,
+        load_seconds=args.load_seconds,
+        keep_alive=args.keep_alive,
+        prompt_tokens_per_sec=args.prompt_tokens_per_sec,
+        parallel=args.parallel,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=11434)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    server = make_server(config_from_args(args), args.host, args.port)
+    print(f"Fake Ollama listening on {base_url(server)}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,317 @@
+"""End-to-end load generator for /summarize and /summarize_stream.
+
+Drives a running app at a fixed concurrency (closed loop) or a fixed
+request rate (open loop), or replays a recorded request log, then reports
+time to first byte, latency percentiles, throughput and errors.
+
+    python benchmarks/load_test.py --url http://127.0.0.1:5000 --concurrency 32 --requests 500
+    python benchmarks/load_test.py --rate 20 --duration 60 --endpoint summarize_stream
+    python benchmarks/load_test.py --replay requests.log.jsonl --speed 2
+
+With --fake-backend, the app and a fake Ollama (benchmarks/fake_ollama.py)
+are started in this process, so a run needs neither a model nor a GPU.
+The fake Ollama options (--ttft, --tokens-per-sec, --error-rate, ...) tune
+the backend:
+
+    python benchmarks/load_test.py --fake-backend --ttft 0.5 --tokens-per-sec 30 \\
+        --error-rate 0.02 --concurrency 64 --requests 1000
+
+A request log is JSON lines of {"offset": seconds, "endpoint": ..., "agent":
+..., "text": ...}; --record writes one for the requests a run sends.
+"""
+import argparse
+import contextlib
+import itertools
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import fake_ollama  # noqa: E402
+
+ENDPOINTS = ('summarize', 'summarize_stream')
+# /summarize reports upstream failures inside a 200 response
+SUMMARY_ERRORS = ('Failed to get response from the API.', 'Error during summarization')
+
+FILLER = ("Load testing sends a steady stream of documents through the summarizer. "
+          "Each one is a few paragraphs long and unique, so no cache can answer it.\n\n")
+
+
+def make_text(index, size):
+    head = f"Document {index}. "
+    return head + (FILLER * (size // len(FILLER) + 1))[:max(0, size - len(head))]
+
+
+class Result:
+    __slots__ = ('endpoint', 'status', 'error', 'ttfb', 'latency', 'bytes')
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.status = None
+        self.error = None
+        self.ttfb = None
+        self.latency = None
+        self.bytes = 0
+
+
+class LoadGenerator:
+    def __init__(self, base_url, timeout=300, record=None):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.local = threading.local()
+        self.results = []
+        self.lock = threading.Lock()
+        self.record = record
+        self.started = None
+
+    def session(self):
+        session = getattr(self.local, 'session', None)
+        if session is None:
+            session = self.local.session = requests.Session()
+        return session
+
+    def send(self, request):
+        """Send one logged request and keep its Result"""
+        if self.record is not None:
+            with self.lock:
+                entry = dict(request, offset=round(time.perf_counter() - self.started, 3))
+                self.record.write(json.dumps(entry) + '\n')
+
+        endpoint = request['endpoint']
+        result = Result(endpoint)
+        body = {'text': request['text'], 'agent': request['agent']}
+        if request.get('chunked'):
+            body['chunked'] = True
+        start = time.perf_counter()
+        try:
+            response = self.session().post(f"{self.base_url}/{endpoint}", json=body,
+                                           stream=True, timeout=self.timeout)
+            result.status = response.status_code
+            parts = []
+            with response:
+                for chunk in response.iter_content(chunk_size=None):
+                    if result.ttfb is None:
+                        result.ttfb = time.perf_counter() - start
+                    result.bytes += len(chunk)
+                    parts.append(chunk)
+            result.latency = time.perf_counter() - start
+            result.error = classify(endpoint, response.status_code, b''.join(parts))
+        except requests.exceptions.Timeout:
+            result.error = 'timeout'
+        except requests.exceptions.ConnectionError:
+            result.error = 'connection'
+        except requests.exceptions.RequestException as e:
+            result.error = type(e).__name__
+        with self.lock:
+            self.results.append(result)
+        return result
+
+    def run_closed(self, requests_iter, concurrency, deadline):
+        """Keep `concurrency` requests in flight until the iterator or deadline runs out"""
+        self.started = time.perf_counter()
+        source = iter(requests_iter)
+        source_lock = threading.Lock()
+
+        def worker():
+            while deadline is None or time.perf_counter() < deadline:
+                with source_lock:
+                    request = next(source, None)
+                if request is None:
+                    return
+                self.send(request)
+
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - self.started
+
+    def run_scheduled(self, schedule, max_in_flight):
+        """Send each (offset, request) at its offset, whatever is still in flight"""
+        self.started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+            for offset, request in schedule:
+                delay = self.started + offset - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(self.send, request)
+        return time.perf_counter() - self.started
+
+
+def classify(endpoint, status, body):
+    if status != 200:
+        return f'http_{status}'
+    text = body.decode('utf-8', errors='replace')
+    if endpoint == 'summarize_stream':
+        return 'upstream' if 'event: error' in text else None
+    try:
+        summary = json.loads(text).get('summary', '')
+    except ValueError:
+        return 'bad_json'
+    return 'upstream' if summary.startswith(SUMMARY_ERRORS) else None
+
+
+def percentiles(values, points=(50, 90, 95, 99)):
+    if not values:
+        return {}
+    ordered = sorted(values)
+    stats = {f'p{p}': ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+             for p in points}
+    stats['max'] = ordered[-1]
+    stats['mean'] = sum(ordered) / len(ordered)
+    return stats
+
+
+def summarize_results(results, wall_seconds):
+    report = {'wall_seconds': wall_seconds, 'endpoints': {}}
+    for endpoint in sorted({r.endpoint for r in results}):
+        subset = [r for r in results if r.endpoint == endpoint]
+        ok = [r for r in subset if r.error is None]
+        errors = {}
+        for r in subset:
+            if r.error is not None:
+                errors[r.error] = errors.get(r.error, 0) + 1
+        report['endpoints'][endpoint] = {
+            'requests': len(subset),
+            'ok': len(ok),
+            'errors': errors,
+            'throughput_rps': len(ok) / wall_seconds if wall_seconds else 0.0,
+            'ttfb_seconds': percentiles([r.ttfb for r in ok if r.ttfb is not None]),
+            'latency_seconds': percentiles([r.latency for r in ok]),
+            'bytes': sum(r.bytes for r in subset),
+        }
+    return report
+
+
+def print_report(report):
+    print(f"\nWall time {report['wall_seconds']:.2f} s")
+    for endpoint, stats in report['endpoints'].items():
+        print(f"\n/{endpoint}: {stats['requests']} requests, {stats['ok']} ok, "
+              f"{stats['throughput_rps']:.2f} req/s")
+        if stats['errors']:
+            print("  errors: " + ', '.join(f"{k}={v}" for k, v in sorted(stats['errors'].items())))
+        for label, key in (('TTFB', 'ttfb_seconds'), ('latency', 'latency_seconds')):
+            values = stats[key]
+            if values:
+                print(f"  {label:<8}" + '  '.join(f"{k} {v * 1000:8.1f} ms"
+                                                  for k, v in values.items()))
+
+
+def generated_requests(args):
+    endpoints = itertools.cycle(args.endpoint or ['summarize_stream'])
+    for index in itertools.count():
+        if args.requests is not None and index >= args.requests:
+            return
+        yield {'endpoint': next(endpoints), 'agent': args.agent,
+               'text': make_text(index, args.text_bytes)}
+
+
+def load_log(path):
+    with open(path) as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    entries.sort(key=lambda entry: entry.get('offset', 0))
+    return entries
+
+
+def start_app(args):
+    """Run the app against an in-process fake Ollama; return the app's base URL"""
+    backend = fake_ollama.start_server(fake_ollama.config_from_args(args))
+    os.environ['OLLAMA_BACKENDS'] = fake_ollama.base_url(backend)
+    os.environ.setdefault('SUMMARY_CACHE', '0')
+    os.environ.setdefault('HISTORY_DB_PATH',
+                          os.path.join(tempfile.mkdtemp(), 'history.sqlite3'))
+    os.chdir(ROOT)
+
+    from werkzeug.serving import make_server
+    import app as web
+    from transport import get_transport
+
+    get_transport().configure(pool_maxsize=max(args.concurrency, args.max_in_flight))
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, web.app, threaded=True)
+    server.socket.listen(512)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"App on http://127.0.0.1:{server.server_port}, "
+          f"fake Ollama on {fake_ollama.base_url(backend)}")
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split('\n', 2)[2],
+    )
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='app base URL')
+    parser.add_argument('--endpoint', action='append', choices=ENDPOINTS,
+                        help='endpoint to load (repeat to alternate; default summarize_stream)')
+    parser.add_argument('--agent', default='Condensed')
+    parser.add_argument('--text-bytes', type=int, default=2000, help='size of each input text')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--concurrency', type=int, default=8,
+                      help='closed loop: requests kept in flight')
+    mode.add_argument('--rate', type=float, help='open loop: requests started per second')
+    mode.add_argument('--replay', metavar='LOG', help='replay a recorded request log')
+    parser.add_argument('--requests', type=int, help='stop after this many requests')
+    parser.add_argument('--duration', type=float, help='stop starting requests after this long')
+    parser.add_argument('--speed', type=float, default=1.0, help='replay speed multiplier')
+    parser.add_argument('--max-in-flight', type=int, default=256,
+                        help='thread cap for --rate and --replay')
+    parser.add_argument('--timeout', type=float, default=300)
+    parser.add_argument('--record', metavar='LOG', help='write the sent requests as a log')
+    parser.add_argument('--output', help='write the report as JSON')
+    parser.add_argument('--fake-backend', action='store_true',
+                        help='serve the app in-process against a fake Ollama')
+    fake_ollama.add_arguments(parser.add_argument_group('fake backend'))
+    args = parser.parse_args()
+
+    if args.requests is None and args.duration is None and not args.replay:
+        args.requests = 100
+
+    url = start_app(args) if args.fake_backend else args.url
+    record = open(args.record, 'w') if args.record else None
+    generator = LoadGenerator(url, timeout=args.timeout, record=record)
+    with contextlib.ExitStack() as stack:
+        if record is not None:
+            stack.callback(record.close)
+        if args.fake_backend:
+            # The in-process agents print every summary; keep the report readable
+            stack.enter_context(contextlib.redirect_stdout(open(os.devnull, 'w')))
+        if args.replay:
+            schedule = [(entry.get('offset', 0) / args.speed, entry)
+                        for entry in load_log(args.replay)]
+            wall = generator.run_scheduled(schedule, args.max_in_flight)
+        elif args.rate:
+            count = args.requests
+            if args.duration is not None:
+                by_time = int(args.duration * args.rate)
+                count = by_time if count is None else min(count, by_time)
+            source = generated_requests(argparse.Namespace(**{**vars(args), 'requests': count}))
+            schedule = ((i / args.rate, request) for i, request in enumerate(source))
+            wall = generator.run_scheduled(schedule, args.max_in_flight)
+        else:
+            deadline = time.perf_counter() + args.duration if args.duration else None
+            wall = generator.run_closed(generated_requests(args), args.concurrency, deadline)
+
+    report = summarize_results(generator.results, wall)
+    report['mode'] = 'replay' if args.replay else 'rate' if args.rate else 'concurrency'
+    report['target'] = args.replay or args.rate or args.concurrency
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,326 @@
+"""Offline micro-benchmarks for the per-request hot path.
+
+Covers input normalization in prepare_messages, NDJSON stream decoding in
+process_stream (and the decoder alone with each JSON backend, with and
+without its byte-level fast path), paragraph segmentation, AgentManager
+start-up (including discovery of 500 agent definitions) and the session
+cookie / history store round trips. Nothing talks to Ollama.
+
+    python benchmarks/run.py                          # run all, save JSON
+    python benchmarks/run.py --only normalize         # cases matching a substring
+    python benchmarks/run.py --compare benchmarks/results/baseline.json
+
+Results are written to benchmarks/results/latest.json (see --output). With
+--compare, every case slower than the baseline by more than --threshold is
+reported as a regression and the exit status is 1.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import ollama_stream  # noqa: E402
+from agent_engine import Agent, load_definitions  # noqa: E402
+from agent_manage import AgentManager  # noqa: E402
+from history_store import HistoryStore  # noqa: E402
+from segmenter import paragraph_segments  # noqa: E402
+
+DEFAULT_OUTPUT = os.path.join(ROOT, 'benchmarks', 'results', 'latest.json')
+DEFAULT_THRESHOLD = 0.25
+
+SIZES = {
+    '1KB': 1 << 10,
+    '100KB': 100 << 10,
+    '1MB': 1 << 20,
+    '10MB': 10 << 20,
+}
+
+SAMPLE = ("The model reads the   chapter\tand writes a short summary.\n\n"
+          "Each  idea gets one bullet;   whitespace is collapsed first.  ")
+
+
+def make_text(size):
+    return (SAMPLE * (size // len(SAMPLE) + 1))[:size]
+
+
+def make_tokens(count, size=4):
+    text = make_text(count * size)
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class FakeResponse:
+    """Just enough of a streamed requests.Response for process_stream"""
+
+    def __init__(self, lines):
+        self.lines = lines
+
+    def iter_lines(self):
+        return iter(self.lines)
+
+    def close(self):
+        pass
+
+
+def ndjson_lines(tokens):
+    """Stream lines in Ollama's compact encoding"""
+    def dumps(record):
+        return json.dumps(record, separators=(',', ':')).encode()
+
+    lines = [dumps({'model': 'llama3.2', 'created_at': '2024-01-01T00:00:00Z',
+                    'message': {'role': 'assistant', 'content': token},
+                    'done': False}) for token in tokens]
+    lines.append(dumps({'model': 'llama3.2', 'message': {'role': 'assistant', 'content': ''},
+                        'done': True, 'eval_count': len(tokens)}))
+    return lines
+
+
+def condensed_agent():
+    return Agent(load_definitions(os.path.join(ROOT, 'agents', 'condensed.json'))[0])
+
+
+# Each case builder does its setup and returns the zero-argument callable to time
+
+def case_normalize(size):
+    agent = condensed_agent()
+    text = make_text(size)
+    return lambda: agent.prepare_messages(text)
+
+
+def case_process_stream(tokens):
+    agent = condensed_agent()
+    lines = ndjson_lines(make_tokens(tokens))
+
+    def run():
+        agent.process_stream(FakeResponse(lines), display_output=False)
+    run.tokens = len(lines)
+    return run
+
+
+def case_chat_decode(tokens, backend, fast_path):
+    """The stream decoder with a given JSON backend, with or without the byte-level path"""
+    lines = ndjson_lines(make_tokens(tokens))
+    loads = orjson.loads if backend == 'orjson' else json.loads
+
+    def run():
+        saved = ollama_stream.decode_record, ollama_stream.FAST_PATH
+        ollama_stream.decode_record, ollama_stream.FAST_PATH = loads, fast_path
+        try:
+            ollama_stream.read_chat_reply(lines)
+        finally:
+            ollama_stream.decode_record, ollama_stream.FAST_PATH = saved
+    run.tokens = len(lines)
+    return run
+
+
+def case_segment(tokens):
+    chunks = make_tokens(tokens)
+
+    def run():
+        for _ in paragraph_segments(chunks):
+            pass
+    return run
+
+
+def case_load_agents():
+    def run():
+        # Discovery only: lists every agent without importing any
+        with contextlib.redirect_stdout(io.StringIO()):
+            AgentManager().get_available_agents()
+    return run
+
+
+def case_load_definitions(directory, count=500):
+    """Discovery of many prompt styles, one definition file each"""
+    agents_dir = os.path.join(directory, 'definitions')
+    os.makedirs(agents_dir, exist_ok=True)
+    for i in range(count):
+        with open(os.path.join(agents_dir, f'style_{i}.json'), 'w') as f:
+            json.dump({'name': f'Style {i}', 'prompt': make_text(1 << 10)}, f)
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            AgentManager(agents_dir=agents_dir).get_available_agents()
+    return run
+
+
+def case_first_agent():
+    def run():
+        # Discovery plus importing and building one agent, as on a first request
+        with contextlib.redirect_stdout(io.StringIO()):
+            AgentManager().get_agent_instance('Condensed')
+    return run
+
+
+def case_session_cookie():
+    from flask import Flask
+    app = Flask(__name__)
+    app.secret_key = 'benchmark'
+    serializer = app.session_interface.get_signing_serializer(app)
+    session = {'cid': '0123456789abcdef0123456789abcdef'}
+    return lambda: serializer.loads(serializer.dumps(session))
+
+
+def case_history_add(directory):
+    store = HistoryStore(os.path.join(directory, 'add.sqlite3'), max_entries=200)
+    text, summary = make_text(4 << 10), make_text(1 << 10)
+    counter = iter(range(sys.maxsize))
+    return lambda: store.add('client', str(next(counter)), 'Condensed', text, summary)
+
+
+def case_history_page(directory):
+    store = HistoryStore(os.path.join(directory, 'page.sqlite3'), max_entries=200)
+    text, summary = make_text(4 << 10), make_text(1 << 10)
+    for i in range(200):
+        store.add('client', str(i), 'Condensed', text, summary)
+
+    def run():
+        entries, _ = store.page('client', limit=10)
+        json.dumps({'items': entries})
+    return run
+
+
+def cases(directory):
+    """Yield (name, builder) for every benchmark case"""
+    for label, size in SIZES.items():
+        yield f'normalize/{label}', lambda size=size: case_normalize(size)
+    for tokens in (500, 5000):
+        yield f'process_stream/{tokens}_tokens', lambda t=tokens: case_process_stream(t)
+        yield f'segment/{tokens}_tokens', lambda t=tokens: case_segment(t)
+    for backend in ('json', 'orjson') if orjson is not None else ('json',):
+        for fast_path in (False, True):
+            label = f"{backend}+fast_path" if fast_path else backend
+            yield (f'chat_decode/{label}/5000_tokens',
+                   lambda b=backend, f=fast_path: case_chat_decode(5000, b, f))
+    yield 'load_agents', case_load_agents
+    yield 'load_agents/first_agent', case_first_agent
+    yield 'load_agents/500_definitions', lambda: case_load_definitions(directory)
+    yield 'session_cookie/roundtrip', case_session_cookie
+    yield 'history/add', lambda: case_history_add(directory)
+    yield 'history/page', lambda: case_history_page(directory)
+
+
+def measure(fn, repeat, min_time):
+    """Best and median seconds per call, timeit-style"""
+    timer = timeit.Timer(fn)
+    number, elapsed = timer.autorange()
+    # autorange stops at 0.2 s; scale up to min_time for stabler numbers
+    if elapsed < min_time:
+        number = max(number, int(number * min_time / max(elapsed, 1e-9)))
+    runs = [seconds / number for seconds in timer.repeat(repeat=repeat, number=number)]
+    return {
+        'best': min(runs),
+        'median': statistics.median(runs),
+        'loops': number,
+        'repeat': repeat,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(only=None, repeat=5, min_time=0.2):
+    """Run the suite and return the results document"""
+    os.chdir(ROOT)
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for name, build in cases(directory):
+            if only and not any(pattern in name for pattern in only):
+                continue
+            fn = build()
+            results[name] = measure(fn, repeat, min_time)
+            line = (f"{name:<40} {format_seconds(results[name]['best']):>12}"
+                    f"   (median {format_seconds(results[name]['median'])})")
+            tokens = getattr(fn, 'tokens', None)
+            if tokens:
+                # Single-threaded, so this is tokens per second per core
+                results[name]['tokens_per_second'] = tokens / results[name]['best']
+                line += f"   {results[name]['tokens_per_second']:,.0f} tokens/s"
+            print(line)
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+
+
+def compare(current, baseline, threshold):
+    """Return [(name, baseline, current, ratio)] for cases slower than threshold"""
+    regressions = []
+    print(f"\nCompared with {baseline.get('revision') or 'baseline'} "
+          f"({baseline.get('created', '?')}):")
+    for name, result in current['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            continue
+        ratio = result['best'] / before['best']
+        flag = ''
+        if ratio > 1 + threshold:
+            regressions.append((name, before['best'], result['best'], ratio))
+            flag = '  REGRESSION'
+        print(f"{name:<40} {format_seconds(before['best']):>12} -> "
+              f"{format_seconds(result['best']):>12}  {ratio:6.2f}x{flag}")
+    return regressions
+
+
+def format_seconds(seconds):
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--only', action='append',
+                        help='run only cases whose name contains this (repeatable)')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=0.2,
+                        help='seconds each timing run should last at least')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    parser.add_argument('--compare', metavar='BASELINE',
+                        help='results JSON from an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='slowdown ratio counted as a regression (0.25 = 25%% slower)')
+    args = parser.parse_args()
+
+    current = run(args.only, args.repeat, args.min_time)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(current, f, indent=2)
+    print(f"\nSaved {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""Stress check: concurrent requests against shared agents must not cross-talk.
+
+Starts an in-process echo backend that streams the user message back in
+Ollama's NDJSON format, then fires many concurrent requests through the
+Flask app and directly through shared agent instances. Each request
+carries a unique marker that must come back in its own response and in no
+other.
+
+    python benchmarks/stress_concurrency.py --requests 2000 --concurrency 64
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+os.environ.setdefault('SUMMARY_CACHE', '0')
+# Every request must get through; 429s from admission would read as failures
+os.environ.setdefault('ADMISSION_QUEUE', '100000')
+
+MARKER = re.compile(r'req-\d+-[a-z]+')
+
+
+class EchoHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length))
+        words = payload['messages'][-1]['content'].split(' ')
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for word in words + ['']:
+            record = {'message': {'role': 'assistant', 'content': word + ' '},
+                      'done': not word}
+            line = json.dumps(record).encode('utf-8') + b'\n'
+            self.wfile.write(b'%x\r\n%s\r\n' % (len(line), line))
+            # Yield so concurrent generations actually interleave
+            time.sleep(0)
+        self.wfile.write(b'0\r\n\r\n')
+
+
+def start_backend():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), EchoHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def check(marker, output):
+    found = set(MARKER.findall(output))
+    return found == {marker}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=64)
+    args = parser.parse_args()
+
+    server = start_backend()
+    backend_url = f"http://127.0.0.1:{server.server_port}/api/chat"
+
+    import app as web
+    from transport import get_transport
+
+    get_transport().configure(pool_maxsize=args.concurrency)
+    agent_names = web.agent_manager.get_available_agents()
+    for name in agent_names:
+        web.agent_manager.get_agent_instance(name).url = backend_url
+
+    client = web.app.test_client()
+
+    def via_agent(i):
+        name = agent_names[i % len(agent_names)]
+        marker = f"req-{i}-agent"
+        text = f"Sentence for {marker} one. Second sentence {marker} here."
+        agent = web.agent_manager.get_agent_instance(name)
+        payload = agent.create_request(text).payload
+        response = agent.send_streaming_request(payload)
+        return check(marker, agent.process_stream(response, display_output=False))
+
+    def via_stream_route(i):
+        name = agent_names[i % len(agent_names)]
+        marker = f"req-{i}-stream"
+        text = f"Sentence for {marker} one. Second sentence {marker} here."
+        response = client.post('/summarize_stream', json={'text': text, 'agent': name})
+        return check(marker, response.get_data(as_text=True))
+
+    for label, fn in (('agent', via_agent), ('stream route', via_stream_route)):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            results = list(pool.map(fn, range(args.requests)))
+        elapsed = time.perf_counter() - start
+        failures = results.count(False)
+        print(f"{label:>12}: {args.requests} requests, concurrency {args.concurrency}, "
+              f"{failures} cross-talk failures, {args.requests / elapsed:.0f} req/s")
+        if failures:
+            server.shutdown()
+            sys.exit(1)
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
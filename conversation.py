@@ -0,0 +1,187 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from agent_request import normalize_text
+from sizing import plan_context
+
+# Seconds a conversation stays open after its last turn
+DEFAULT_TTL = float(os.environ.get('CONVERSATION_TTL', 1800))
+DEFAULT_MAX_CONVERSATIONS = int(os.environ.get('CONVERSATION_MAX', 1000))
+# Bound on the message text held across all conversations
+DEFAULT_MAX_BYTES = int(os.environ.get('CONVERSATION_MAX_BYTES', 64 * 1024 * 1024))
+
+
+class ConversationBusy(Exception):
+    """A follow-up arrived while the previous turn of the conversation was still running"""
+
+
+def _message_bytes(messages):
+    # The system prompt is shared with the agent, so only the turns count
+    return sum(len(m['content'].encode('utf-8')) for m in messages if m['role'] != 'system')
+
+
+class Conversation:
+    """The messages of one summary and its follow-ups, exactly as sent to Ollama
+
+    Each turn resends the whole history; because it is byte-for-byte the
+    prompt of the previous turn plus its reply, Ollama finds it already
+    evaluated in the KV cache and only processes the new question. That
+    holds on the host that served the previous turn, so it is kept here.
+    """
+
+    __slots__ = ('id', 'owner', 'agent_name', 'messages', 'host', 'turns',
+                 'size', 'created', 'last_used', 'busy')
+
+    def __init__(self, conversation_id, owner, agent_name, messages, host=None):
+        self.id = conversation_id
+        self.owner = owner
+        self.agent_name = agent_name
+        self.messages = messages
+        self.host = host
+        self.turns = 0
+        self.size = _message_bytes(messages)
+        self.created = self.last_used = time.monotonic()
+        self.busy = False
+
+    def to_dict(self):
+        return {
+            'request_id': self.id,
+            'agent': self.agent_name,
+            'turns': self.turns,
+            'messages': len(self.messages),
+            'bytes': self.size,
+            'host': self.host,
+        }
+
+
+class ConversationStore:
+    """Open conversations by request id, in memory
+
+    Least recently used conversations are evicted beyond max_conversations
+    or max_bytes of message text, and any conversation idle for ttl seconds
+    expires. Only the client that made the summary can follow it up.
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL, max_conversations=DEFAULT_MAX_CONVERSATIONS,
+                 max_bytes=DEFAULT_MAX_BYTES):
+        self.ttl = ttl
+        self.max_conversations = max_conversations
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.conversations = OrderedDict()
+        self.size = 0
+        self.counters = {'started': 0, 'follow_ups': 0, 'expired': 0, 'evicted': 0,
+                         'busy': 0}
+
+    def start(self, conversation_id, owner, agent_name, messages, reply, host=None):
+        """Open a conversation from a finished summary: its prompt messages and the reply"""
+        conversation = Conversation(
+            conversation_id, owner, agent_name,
+            list(messages) + [{'role': 'assistant', 'content': reply}], host)
+        with self.lock:
+            self._remove(conversation_id)
+            self.conversations[conversation_id] = conversation
+            self.size += conversation.size
+            self.counters['started'] += 1
+            self._evict()
+        return conversation
+
+    def get(self, conversation_id, owner):
+        """The conversation, or None if unknown, expired or not the owner's"""
+        with self.lock:
+            self._expire()
+            conversation = self.conversations.get(conversation_id)
+            if conversation is None or conversation.owner != owner:
+                return None
+            return conversation
+
+    @contextmanager
+    def turn(self, conversation):
+        """Hold a conversation for one follow-up; raises ConversationBusy if one is running"""
+        with self.lock:
+            if conversation.busy:
+                self.counters['busy'] += 1
+                raise ConversationBusy('A follow-up to this summary is still running')
+            conversation.busy = True
+        try:
+            yield conversation
+        finally:
+            with self.lock:
+                conversation.busy = False
+                conversation.last_used = time.monotonic()
+                # Most recently used last, so eviction and expiry take idle ones first
+                if self.conversations.get(conversation.id) is conversation:
+                    self.conversations.move_to_end(conversation.id)
+
+    def extend(self, conversation, messages, reply, host=None):
+        """Record a finished follow-up: the messages it sent plus its reply"""
+        messages = list(messages) + [{'role': 'assistant', 'content': reply}]
+        with self.lock:
+            size = _message_bytes(messages)
+            if self.conversations.get(conversation.id) is conversation:
+                self.size += size - conversation.size
+                self.conversations.move_to_end(conversation.id)
+            conversation.messages = messages
+            conversation.size = size
+            conversation.host = host or conversation.host
+            conversation.turns += 1
+            conversation.last_used = time.monotonic()
+            self.counters['follow_ups'] += 1
+            self._evict()
+
+    def _remove(self, conversation_id):
+        conversation = self.conversations.pop(conversation_id, None)
+        if conversation is not None:
+            self.size -= conversation.size
+
+    def _expire(self):
+        now = time.monotonic()
+        # Least recently used first, so stop at the first one still live
+        while self.conversations:
+            conversation = next(iter(self.conversations.values()))
+            if now - conversation.last_used <= self.ttl:
+                return
+            self._remove(conversation.id)
+            self.counters['expired'] += 1
+
+    def _evict(self):
+        self._expire()
+        while self.conversations and (len(self.conversations) > self.max_conversations or
+                                      self.size > self.max_bytes):
+            self._remove(next(iter(self.conversations)))
+            self.counters['evicted'] += 1
+
+    def stats(self):
+        with self.lock:
+            self._expire()
+            return dict(self.counters, conversations=len(self.conversations),
+                        bytes=self.size, max_bytes=self.max_bytes,
+                        max_conversations=self.max_conversations, ttl=self.ttl)
+
+
+def follow_up_request(conversation, agent, text):
+    """(messages, plan, payload) for a follow-up question on a conversation
+
+    The new question goes after the stored history untouched, so the
+    cached prefix holds, unless the longer history moves num_ctx up a step.
+    """
+    messages = conversation.messages + [{'role': 'user', 'content': normalize_text(text)}]
+    plan = plan_context(messages, agent.num_predict, agent.model)
+    return messages, plan, agent.build_payload(messages, plan)
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def get_conversation_store():
+    """Return the process-wide store of open conversations"""
+    global _default_store
+    if _default_store is None:
+        with _default_lock:
+            if _default_store is None:
+                _default_store = ConversationStore()
+    return _default_store
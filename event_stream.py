@@ -0,0 +1,277 @@
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+
+from segmenter import DEFAULT_MAX_DELAY, StreamSegmenter
+from singleflight import DeadlineExceeded, FlightError, UpstreamUnavailable
+
+# Events kept per stream for Last-Event-ID replay
+DEFAULT_BUFFER_EVENTS = int(os.environ.get('SSE_BUFFER_EVENTS', 1024))
+# Seconds a generation keeps running with no client attached, waiting for a resume
+DEFAULT_RESUME_GRACE = float(os.environ.get('SSE_RESUME_GRACE', 15))
+# Seconds a finished stream can still be replayed
+DEFAULT_RETAIN_SECONDS = float(os.environ.get('SSE_RETAIN_SECONDS', 300))
+DEFAULT_MAX_STREAMS = int(os.environ.get('SSE_MAX_STREAMS', 1000))
+KEEPALIVE_SECONDS = 15
+# How often a pump checks for an abandoned stream and for text held too long
+# (SEGMENT_MAX_DELAY) while no output arrives
+PUMP_TICK_SECONDS = 1.0
+
+KEEPALIVE = ': keep-alive\n\n'
+SSE_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+LINE_BREAK = re.compile(r'\r\n|\r|\n')
+
+
+def format_event(event_id, event, data):
+    """One SSE frame; multi-line data becomes several data: lines"""
+    lines = [f'id: {event_id}', f'event: {event}']
+    lines.extend(f'data: {line}' for line in LINE_BREAK.split(data))
+    return '\n'.join(lines) + '\n\n'
+
+
+def parse_last_event_id(value):
+    try:
+        return max(0, int(value))
+    except (TypeError, ValueError):
+        return 0
+
+
+class EventLog:
+    """The numbered events of one stream
+
+    Keeps the last buffer_events events for replay. Segments that fall
+    out of the buffer are folded into one text, so a client that resumes
+    from an evicted id gets a 'reset' event carrying everything before
+    the buffer, then the buffered events.
+    """
+
+    def __init__(self, stream_id, owner, buffer_events=DEFAULT_BUFFER_EVENTS):
+        self.stream_id = stream_id
+        self.owner = owner
+        self.events = deque(maxlen=buffer_events)
+        self.evicted_text = []
+        self.last_id = 0
+        self.done = False
+        self.finished_at = None
+        self.attached = 0
+        # None until a client first attaches, so a new stream is never abandoned
+        self.detached_at = None
+        self.condition = threading.Condition()
+
+    def append(self, event, data):
+        with self.condition:
+            if len(self.events) == self.events.maxlen and self.events[0][1] == 'segment':
+                self.evicted_text.append(self.events[0][2])
+            self.last_id += 1
+            self.events.append((self.last_id, event, data))
+            if event in ('done', 'error'):
+                self.done = True
+                self.finished_at = time.monotonic()
+            self.condition.notify_all()
+        self._notify()
+
+    def _notify(self):
+        pass
+
+    def finish(self, **info):
+        self.append('done', json.dumps(dict(info, request_id=self.stream_id)))
+
+    def fail(self, message):
+        self.append('error', message)
+
+    def attach(self):
+        with self.condition:
+            self.attached += 1
+
+    def detach(self):
+        with self.condition:
+            self.attached -= 1
+            self.detached_at = time.monotonic()
+
+    def abandoned(self, grace):
+        """True once no client has been attached for grace seconds"""
+        with self.condition:
+            return (self.attached == 0 and self.detached_at is not None and
+                    time.monotonic() - self.detached_at >= grace)
+
+    def _frames_after(self, cursor):
+        """Under the condition: (frames, new cursor, finished) for events after cursor"""
+        cursor = min(cursor, self.last_id)
+        frames = []
+        first = self.events[0][0] if self.events else self.last_id + 1
+        if cursor < first - 1:
+            frames.append(format_event(first - 1, 'reset', ''.join(self.evicted_text)))
+            cursor = first - 1
+        for event_id, event, data in self.events:
+            if event_id > cursor:
+                frames.append(format_event(event_id, event, data))
+        return frames, self.last_id, self.done
+
+    def follow(self, after_id=0, keepalive=KEEPALIVE_SECONDS):
+        """Yield SSE frames after after_id until the stream ends, with keep-alive comments"""
+        self.attach()
+        try:
+            cursor = after_id
+            while True:
+                with self.condition:
+                    if self.last_id <= cursor and not self.done:
+                        self.condition.wait(keepalive)
+                    frames, cursor, finished = self._frames_after(cursor)
+                if frames:
+                    yield ''.join(frames)
+                elif not finished:
+                    yield KEEPALIVE
+                if finished:
+                    return
+        finally:
+            self.detach()
+
+
+class AsyncEventLog(EventLog):
+    """EventLog whose readers are coroutines on the event loop"""
+
+    def __init__(self, stream_id, owner, buffer_events=DEFAULT_BUFFER_EVENTS):
+        super().__init__(stream_id, owner, buffer_events)
+        self.changed = asyncio.Event()
+
+    def _notify(self):
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+    async def afollow(self, after_id=0, keepalive=KEEPALIVE_SECONDS):
+        self.attach()
+        try:
+            cursor = after_id
+            while True:
+                if self.last_id <= cursor and not self.done:
+                    try:
+                        await asyncio.wait_for(self.changed.wait(), keepalive)
+                    except asyncio.TimeoutError:
+                        pass
+                with self.condition:
+                    frames, cursor, finished = self._frames_after(cursor)
+                if frames:
+                    yield ''.join(frames)
+                elif not finished:
+                    yield KEEPALIVE
+                if finished:
+                    return
+        finally:
+            self.detach()
+
+
+class StreamRegistry:
+    """Event logs by stream id, kept for replay until they expire"""
+
+    def __init__(self, log_class=EventLog, buffer_events=DEFAULT_BUFFER_EVENTS,
+                 retain_seconds=DEFAULT_RETAIN_SECONDS, max_streams=DEFAULT_MAX_STREAMS):
+        self.log_class = log_class
+        self.buffer_events = buffer_events
+        self.retain_seconds = retain_seconds
+        self.max_streams = max_streams
+        self.lock = threading.Lock()
+        self.streams = {}
+        self.counters = {'created': 0, 'resumed': 0, 'expired': 0}
+
+    def create(self, stream_id, owner):
+        log = self.log_class(stream_id, owner, self.buffer_events)
+        with self.lock:
+            self._prune()
+            self.streams[stream_id] = log
+            self.counters['created'] += 1
+        return log
+
+    def resume(self, stream_id, owner):
+        """The log for a reconnecting client, or None if unknown, expired or not theirs"""
+        with self.lock:
+            self._prune()
+            log = self.streams.get(stream_id)
+            if log is None or log.owner != owner:
+                return None
+            self.counters['resumed'] += 1
+        return log
+
+    def _prune(self):
+        now = time.monotonic()
+        expired = [stream_id for stream_id, log in self.streams.items()
+                   if log.done and now - log.finished_at > self.retain_seconds]
+        # Over the cap, drop the oldest streams (finished ones first)
+        excess = len(self.streams) - len(expired) - self.max_streams + 1
+        if excess > 0:
+            remaining = [(not log.done, stream_id) for stream_id, log in self.streams.items()
+                         if stream_id not in expired]
+            expired.extend(stream_id for _, stream_id in
+                           sorted(remaining, key=lambda item: item[0])[:excess])
+        for stream_id in expired:
+            del self.streams[stream_id]
+        self.counters['expired'] += len(expired)
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters, streams=len(self.streams),
+                        running=sum(1 for log in self.streams.values() if not log.done))
+
+
+def pump(log, flight, deadline=None, grace=DEFAULT_RESUME_GRACE, on_complete=None):
+    """Follow a flight into an event log, independent of any client connection
+
+    Meant for its own thread. Once no client has been attached for grace
+    seconds the pump leaves the flight, which stops the generation unless
+    another request is following it; that is checked on every chunk and
+    every PUMP_TICK_SECONDS, so a long prefill or a stall does not keep it
+    running. Text without a sentence end is sent once it has waited
+    SEGMENT_MAX_DELAY seconds. on_complete(summary) runs before the done
+    event.
+    """
+    segmenter = StreamSegmenter(max_delay=DEFAULT_MAX_DELAY)
+    chunks = flight.subscribe(deadline, tick=PUMP_TICK_SECONDS)
+    try:
+        for chunk in chunks:
+            for segment in segmenter.feed(chunk) if chunk else segmenter.poll():
+                log.append('segment', segment)
+            if log.abandoned(grace):
+                log.fail('Stream abandoned')
+                return
+        for segment in segmenter.flush():
+            log.append('segment', segment)
+        if on_complete is not None:
+            on_complete(''.join(flight.chunks))
+        log.finish()
+    except UpstreamUnavailable:
+        log.fail('Could not connect')
+    except (FlightError, DeadlineExceeded) as e:
+        for segment in segmenter.flush():
+            log.append('segment', segment)
+        log.fail(f'Streaming error: {e}')
+    finally:
+        chunks.close()
+
+
+async def apump(log, flight, deadline=None, grace=DEFAULT_RESUME_GRACE, on_complete=None):
+    """pump() for AsyncFlight, run as a task; on_complete is a coroutine function"""
+    segmenter = StreamSegmenter(max_delay=DEFAULT_MAX_DELAY)
+    chunks = flight.subscribe(deadline, tick=PUMP_TICK_SECONDS)
+    try:
+        async for chunk in chunks:
+            for segment in segmenter.feed(chunk) if chunk else segmenter.poll():
+                log.append('segment', segment)
+            if log.abandoned(grace):
+                log.fail('Stream abandoned')
+                return
+        for segment in segmenter.flush():
+            log.append('segment', segment)
+        if on_complete is not None:
+            await on_complete(''.join(flight.chunks))
+        log.finish()
+    except UpstreamUnavailable:
+        log.fail('Could not connect')
+    except (FlightError, DeadlineExceeded) as e:
+        for segment in segmenter.flush():
+            log.append('segment', segment)
+        log.fail(f'Streaming error: {e}')
+    finally:
+        await chunks.aclose()
@@ -0,0 +1,140 @@
+import queue
+import threading
+import time
+
+from admission import Overloaded
+from agent_request import normalize_text
+from event_stream import PUMP_TICK_SECONDS
+from map_reduce import DEFAULT_CHUNK_TOKENS
+from segmenter import DEFAULT_MAX_DELAY, StreamSegmenter
+from singleflight import DeadlineExceeded, FlightError, UpstreamUnavailable, get_single_flight
+from summary_cache import get_summary_cache
+
+
+def oversized_agents(agent_manager, text, agent_names):
+    """{agent: sizing} for the agents whose single-pass request would not fit their window"""
+    cleaned = normalize_text(text)
+    oversized = {}
+    for agent_name in agent_names:
+        agent = agent_manager.get_agent_instance(agent_name)
+        if agent:
+            sizing = agent.create_request(cleaned, normalized=True).sizing
+            if not sizing.fits:
+                oversized[agent_name] = sizing.to_dict()
+    return oversized
+
+
+def _run_agent(agent_manager, agent_name, agent, text, cleaned, events, stop, deadline=None,
+               chunked=False, chunk_tokens=DEFAULT_CHUNK_TOKENS):
+    """Stream one agent's generation into the shared event queue
+
+    Goes through the summary cache and single-flight like /summarize_stream,
+    so the generation is admitted, measured and cancelled the same way.
+    Input too long for the agent's window (or any input with chunked)
+    runs the map stage first, on the raw text so it is split where
+    /summarize splits it, and streams the final reduce pass. Setting stop
+    abandons the map stage too.
+    """
+    start = time.perf_counter()
+    segmenter = StreamSegmenter(max_delay=DEFAULT_MAX_DELAY)
+
+    def emit(segments):
+        for segment in segments:
+            events.put({'agent': agent_name, 'type': 'segment', 'text': segment})
+
+    def error(message, **extra):
+        events.put(dict({'agent': agent_name, 'type': 'error', 'error': message}, **extra))
+
+    try:
+        timings = None
+        if not chunked:
+            summary_request = agent.create_request(cleaned, normalized=True)
+            # Never send a prompt Ollama would silently cut off
+            chunked = not summary_request.sizing.fits
+        if chunked:
+            summarizer = agent_manager.get_map_reduce(agent_name, chunk_tokens=chunk_tokens)
+            payload, timings = summarizer.prepare(text, deadline, stop)
+        else:
+            payload = summary_request.payload
+        cached = get_summary_cache().get(payload)
+        if cached is not None:
+            emit(segmenter.feed(cached))
+            emit(segmenter.flush())
+            events.put({'agent': agent_name, 'type': 'done', 'cached': True,
+                        'timings': timings, 'seconds': time.perf_counter() - start})
+            return
+
+        # Identical requests already running share one upstream generation
+        flight = get_single_flight().join(payload, agent.send_streaming_request, agent_name)
+        # Ticks let held text go out (and a disconnect be seen) with no output
+        chunks = flight.subscribe(deadline, tick=PUMP_TICK_SECONDS)
+        try:
+            for chunk in chunks:
+                if stop.is_set():
+                    # The client went away; leaving the flight stops the generation
+                    return
+                emit(segmenter.feed(chunk) if chunk else segmenter.poll())
+        finally:
+            chunks.close()
+
+        emit(segmenter.flush())
+        events.put({'agent': agent_name, 'type': 'done', 'cached': False,
+                    'first_token_seconds': flight.stats.ttft,
+                    'timings': timings,
+                    'seconds': time.perf_counter() - start,
+                    'stats': flight.stats.to_dict()})
+    except Overloaded as e:
+        error(str(e), retry_after=e.retry_after)
+    except UpstreamUnavailable:
+        error('Could not connect')
+    except (FlightError, DeadlineExceeded) as e:
+        emit(segmenter.flush())
+        error(str(e))
+    except Exception as e:
+        error(str(e))
+
+
+def fan_out(agent_manager, text, agent_names, deadline=None, chunked=False,
+            chunk_tokens=DEFAULT_CHUNK_TOKENS):
+    """Run several agents on one input at once and yield their tagged events
+
+    The input is normalized once, every agent streams through the shared
+    transport pool, and events from all agents are interleaved in the
+    order they are produced, so the wall time tracks the slowest agent.
+    Agents still running at deadline (a time.monotonic() instant) end
+    with an error event. Long input is summarized in chunks per agent,
+    or with chunked for every agent; callers wanting OVERSIZE_POLICY
+    'reject' check oversized_agents() first.
+    """
+    start = time.perf_counter()
+    # Normalized once for every agent's single-pass request
+    cleaned = normalize_text(text)
+    events = queue.Queue()
+    stop = threading.Event()
+
+    running = 0
+    for agent_name in agent_names:
+        agent = agent_manager.get_agent_instance(agent_name)
+        if not agent:
+            yield {'agent': agent_name, 'type': 'error', 'error': f'Agent {agent_name} not found'}
+            continue
+        thread = threading.Thread(
+            target=_run_agent,
+            args=(agent_manager, agent_name, agent, text, cleaned, events, stop, deadline,
+                  chunked, chunk_tokens),
+            daemon=True,
+        )
+        thread.start()
+        running += 1
+
+    try:
+        while running:
+            event = events.get()
+            if event['type'] in ('done', 'error'):
+                running -= 1
+            yield event
+    finally:
+        # Stops the remaining generations if the client goes away
+        stop.set()
+
+    yield {'type': 'end', 'seconds': time.perf_counter() - start}
@@ -0,0 +1,187 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+
+
+DEFAULT_HISTORY_PATH = os.environ.get('HISTORY_DB_PATH', 'instance/history.sqlite3')
+DEFAULT_MAX_ENTRIES = int(os.environ.get('HISTORY_MAX_ENTRIES', 200))
+DEFAULT_MAX_AGE = float(os.environ.get('HISTORY_MAX_AGE', 30 * 24 * 3600))
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 100
+PREVIEW_CHARS = 200
+SEARCH_TERM = re.compile(r'\w+')
+
+
+class HistoryStore:
+    """Server-side summarization history in SQLite, keyed by an opaque client id"""
+
+    # Drop expired rows after this many inserts rather than on every one
+    EXPIRE_EVERY = 100
+
+    def __init__(self,
+                 db_path=DEFAULT_HISTORY_PATH,
+                 max_entries=DEFAULT_MAX_ENTRIES,
+                 max_age=DEFAULT_MAX_AGE):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.inserts_since_expire = 0
+        self.db = self._open_db()
+
+    def _open_db(self):
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        db = sqlite3.connect(self.db_path, check_same_thread=False)
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('PRAGMA synchronous=NORMAL')
+        db.execute(
+            'CREATE TABLE IF NOT EXISTS history ('
+            ' seq INTEGER PRIMARY KEY AUTOINCREMENT,'
+            ' id TEXT NOT NULL,'
+            ' client_id TEXT NOT NULL,'
+            ' agent TEXT NOT NULL,'
+            ' original_text TEXT NOT NULL,'
+            ' summary TEXT NOT NULL,'
+            ' created REAL NOT NULL)'
+        )
+        db.execute('CREATE INDEX IF NOT EXISTS history_client ON history (client_id, seq)')
+        db.execute('CREATE INDEX IF NOT EXISTS history_created ON history (created)')
+
+        # Full-text index over the history rows, kept in sync by triggers.
+        # client_id is indexed too so a search only walks one client's entries.
+        has_index = db.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'history_fts'"
+        ).fetchone()
+        db.execute(
+            'CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5('
+            ' client_id, original_text, summary,'
+            " content='history', content_rowid='seq', prefix='2 3')"
+        )
+        db.execute(
+            'CREATE TRIGGER IF NOT EXISTS history_fts_insert AFTER INSERT ON history BEGIN'
+            ' INSERT INTO history_fts (rowid, client_id, original_text, summary)'
+            ' VALUES (new.seq, new.client_id, new.original_text, new.summary);'
+            ' END'
+        )
+        db.execute(
+            'CREATE TRIGGER IF NOT EXISTS history_fts_delete AFTER DELETE ON history BEGIN'
+            ' INSERT INTO history_fts (history_fts, rowid, client_id, original_text, summary)'
+            " VALUES ('delete', old.seq, old.client_id, old.original_text, old.summary);"
+            ' END'
+        )
+        if not has_index:
+            # Index rows written before full-text search existed
+            db.execute("INSERT INTO history_fts (history_fts) VALUES ('rebuild')")
+        db.commit()
+        return db
+
+    def add(self, client_id, entry_id, agent, original_text, summary):
+        """Record one finished summary and apply the retention limits"""
+        now = time.time()
+        with self.lock:
+            self.db.execute(
+                'INSERT INTO history (id, client_id, agent, original_text, summary, created)'
+                ' VALUES (?, ?, ?, ?, ?, ?)',
+                (entry_id, client_id, agent, original_text, summary, now),
+            )
+            # Keep only the newest max_entries for this client
+            self.db.execute(
+                'DELETE FROM history WHERE client_id = ? AND seq <= ('
+                ' SELECT seq FROM history WHERE client_id = ?'
+                ' ORDER BY seq DESC LIMIT 1 OFFSET ?)',
+                (client_id, client_id, self.max_entries),
+            )
+            self.inserts_since_expire += 1
+            if self.inserts_since_expire >= self.EXPIRE_EVERY:
+                self.inserts_since_expire = 0
+                self.db.execute('DELETE FROM history WHERE created < ?', (now - self.max_age,))
+            self.db.commit()
+
+    def page(self, client_id, cursor=None, limit=DEFAULT_PAGE_SIZE):
+        """Return (entries, next_cursor), newest first; pass next_cursor back for more"""
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        query = ('SELECT seq, id, agent, original_text, summary, created FROM history'
+                 ' WHERE client_id = ? AND created >= ?')
+        params = [client_id, time.time() - self.max_age]
+        if cursor is not None:
+            query += ' AND seq < ?'
+            params.append(int(cursor))
+        query += ' ORDER BY seq DESC LIMIT ?'
+        params.append(limit + 1)
+
+        with self.lock:
+            rows = self.db.execute(query, params).fetchall()
+
+        next_cursor = str(rows[limit - 1][0]) if len(rows) > limit else None
+        return [self._entry(row) for row in rows[:limit]], next_cursor
+
+    def search(self, client_id, query, cursor=None, limit=DEFAULT_PAGE_SIZE):
+        """Full-text search one client's history, best matches first
+
+        Returns (entries, next_cursor) like page(); each entry also carries
+        highlighted snippets of the matching text.
+        """
+        terms = SEARCH_TERM.findall(query)
+        if not terms:
+            return [], None
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        offset = max(0, int(cursor)) if cursor is not None else 0
+
+        # Quote every term so user input can never be read as FTS syntax;
+        # the last one is a prefix match for search-as-you-type
+        match = ' '.join(f'"{term}"' for term in terms) + '*'
+        match = f'client_id:"{client_id}" AND ({match})'
+
+        with self.lock:
+            rows = self.db.execute(
+                'SELECT h.seq, h.id, h.agent, h.original_text, h.summary, h.created,'
+                "  snippet(history_fts, 1, '<mark>', '</mark>', '...', 16),"
+                "  snippet(history_fts, 2, '<mark>', '</mark>', '...', 16)"
+                ' FROM history_fts JOIN history h ON h.seq = history_fts.rowid'
+                ' WHERE history_fts MATCH ? AND h.created >= ?'
+                ' ORDER BY bm25(history_fts, 0.0, 1.0, 2.0) LIMIT ? OFFSET ?',
+                (match, time.time() - self.max_age, limit + 1, offset),
+            ).fetchall()
+
+        entries = []
+        for row in rows[:limit]:
+            entry = self._entry(row[:6])
+            entry['original_snippet'] = row[6]
+            entry['summary_snippet'] = row[7]
+            entries.append(entry)
+        next_cursor = str(offset + limit) if len(rows) > limit else None
+        return entries, next_cursor
+
+    def _entry(self, row):
+        seq, entry_id, agent, original_text, summary, created = row
+        return {
+            'id': entry_id,
+            'agent': agent,
+            'original_text': (original_text[:PREVIEW_CHARS] + '...'
+                              if len(original_text) > PREVIEW_CHARS else original_text),
+            'summary': summary,
+            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(created)),
+        }
+
+    def clear(self, client_id):
+        with self.lock:
+            self.db.execute('DELETE FROM history WHERE client_id = ?', (client_id,))
+            self.db.commit()
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def get_history_store():
+    """Return the process-wide history store"""
+    global _default_store
+    if _default_store is None:
+        with _default_lock:
+            if _default_store is None:
+                _default_store = HistoryStore()
+    return _default_store
@@ -0,0 +1,191 @@
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from admission import INTERACTIVE
+from event_stream import PUMP_TICK_SECONDS
+from metrics import agent_label
+from singleflight import FlightError, get_single_flight
+from sizing import MAX_CONTEXT, estimate_tokens, num_ctx_for
+from summary_cache import get_summary_cache
+
+
+DEFAULT_CHUNK_TOKENS = int(os.environ.get('MAP_REDUCE_CHUNK_TOKENS', 1500))
+DEFAULT_CONCURRENCY = int(os.environ.get('MAP_REDUCE_CONCURRENCY', 4))
+MAX_REDUCE_LEVELS = 6
+
+PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+SENTENCE_BREAK = re.compile(r'(?<=[.!?])\s+')
+
+REDUCE_INSTRUCTION = (
+    "The following are summaries of consecutive parts of one longer document. "
+    "Combine them into a single summary of the whole document."
+)
+
+
+class MapReduceError(Exception):
+    """Raised when a chunk or reduce pass gets no answer from the backend"""
+
+
+def parse_chunk_tokens(value):
+    """Validate a client-supplied chunk budget, falling back to the default"""
+    try:
+        # A chunk has to leave room for the system prompt and the output
+        return min(max(64, int(value or DEFAULT_CHUNK_TOKENS)), MAX_CONTEXT // 2)
+    except (TypeError, ValueError):
+        return DEFAULT_CHUNK_TOKENS
+
+
+def _split_oversized(piece, max_tokens):
+    """Break a single paragraph that is over budget into sentences, then words"""
+    parts = []
+    for sentence in SENTENCE_BREAK.split(piece):
+        if estimate_tokens(sentence) <= max_tokens:
+            parts.append(sentence)
+            continue
+        words = sentence.split()
+        current = []
+        for word in words:
+            current.append(word)
+            if estimate_tokens(' '.join(current)) > max_tokens and len(current) > 1:
+                current.pop()
+                parts.append(' '.join(current))
+                current = [word]
+        if current:
+            parts.append(' '.join(current))
+    return parts
+
+
+def split_text(text, max_tokens=DEFAULT_CHUNK_TOKENS):
+    """Split text into chunks of at most max_tokens on paragraph/sentence boundaries"""
+    pieces = []
+    for paragraph in PARAGRAPH_BREAK.split(text.strip()):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if estimate_tokens(paragraph) <= max_tokens:
+            pieces.append(paragraph)
+        else:
+            pieces.extend(_split_oversized(paragraph, max_tokens))
+
+    chunks = []
+    current = []
+    current_tokens = 0
+    for piece in pieces:
+        piece_tokens = estimate_tokens(piece)
+        if current and current_tokens + piece_tokens > max_tokens:
+            chunks.append('\n\n'.join(current))
+            current = []
+            current_tokens = 0
+        current.append(piece)
+        current_tokens += piece_tokens
+    if current:
+        chunks.append('\n\n'.join(current))
+    return chunks
+
+
+class MapReduceSummarizer:
+    """Summarize long text by summarizing chunks in parallel, then reducing"""
+
+    def __init__(self, agent, chunk_tokens=DEFAULT_CHUNK_TOKENS,
+                 concurrency=DEFAULT_CONCURRENCY, lane=INTERACTIVE):
+        self.agent = agent
+        self.lane = lane
+        # A chunk has to fit the agent model's window with room for the output
+        self.chunk_tokens = min(chunk_tokens, num_ctx_for(agent.model) // 2)
+        self.concurrency = max(1, concurrency)
+        self.cache = get_summary_cache()
+
+    def build_payload(self, text):
+        return self.agent.create_request(text).payload
+
+    def complete(self, payload, deadline=None, cancel=None):
+        """Run one non-displayed generation through the summary cache and single-flight
+
+        Raises DeadlineExceeded (and abandons the generation) past deadline.
+        Setting cancel (a threading.Event) abandons it too, within a second,
+        and raises MapReduceError.
+        """
+        cached = self.cache.get(payload)
+        if cached is not None:
+            return cached
+        if cancel is not None and cancel.is_set():
+            raise MapReduceError('Cancelled')
+        flight = get_single_flight().join(payload, self.agent.send_streaming_request,
+                                          agent_label(self.agent), self.lane)
+        try:
+            if cancel is None:
+                return flight.text(deadline)
+            chunks = flight.subscribe(deadline, tick=PUMP_TICK_SECONDS)
+            try:
+                for _ in chunks:
+                    if cancel.is_set():
+                        # Closing the subscription leaves the flight
+                        raise MapReduceError('Cancelled')
+            finally:
+                chunks.close()
+            return ''.join(flight.chunks)
+        except FlightError as e:
+            raise MapReduceError(str(e)) from e
+
+    def summarize_chunks(self, executor, chunks, deadline=None, cancel=None):
+        payloads = [self.build_payload(chunk) for chunk in chunks]
+        return list(executor.map(lambda payload: self.complete(payload, deadline, cancel),
+                                 payloads))
+
+    def combine(self, partials):
+        parts = [f"Part {i}:\n{partial.strip()}" for i, partial in enumerate(partials, 1)]
+        return REDUCE_INSTRUCTION + '\n\n' + '\n\n'.join(parts)
+
+    def prepare(self, text, deadline=None, cancel=None):
+        """Run the split and map stages and return (final_payload, timings)
+
+        The final payload is either the plain single-pass request (short
+        input) or the last reduce pass, so callers can stream it. text is
+        split as given, so pass the raw input: its paragraph breaks are the
+        preferred cut points. cancel is as for complete().
+        """
+        timings = {'chunks': 0, 'levels': 0, 'split_seconds': 0.0, 'map_seconds': 0.0}
+
+        start = time.perf_counter()
+        chunks = split_text(text, self.chunk_tokens)
+        timings['split_seconds'] = time.perf_counter() - start
+        timings['chunks'] = len(chunks)
+
+        if len(chunks) <= 1:
+            return self.build_payload(text), timings
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            partials = self.summarize_chunks(executor, chunks, deadline, cancel)
+            timings['levels'] = 1
+
+            # Collapse the partial summaries until they fit in one reduce pass
+            combined = self.combine(partials)
+            while (estimate_tokens(combined) > self.chunk_tokens and
+                   len(partials) > 1 and timings['levels'] < MAX_REDUCE_LEVELS):
+                groups = split_text('\n\n'.join(partials), self.chunk_tokens)
+                if len(groups) >= len(partials):
+                    break
+                partials = self.summarize_chunks(
+                    executor, [self.combine([g]) for g in groups], deadline, cancel)
+                combined = self.combine(partials)
+                timings['levels'] += 1
+        timings['map_seconds'] = time.perf_counter() - start
+
+        return self.build_payload(combined), timings
+
+    def summarize(self, text, deadline=None):
+        """Return (summary, timings) for text of any length
+
+        deadline is a time.monotonic() instant, as from parse_deadline().
+        """
+        start = time.perf_counter()
+        payload, timings = self.prepare(text, deadline)
+
+        reduce_start = time.perf_counter()
+        summary = self.complete(payload, deadline)
+        timings['reduce_seconds'] = time.perf_counter() - reduce_start
+        timings['total_seconds'] = time.perf_counter() - start
+        return summary, timings
@@ -0,0 +1,185 @@
+import re
+import socket
+import threading
+
+import requests
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+SECONDS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+LOAD_BUCKETS = (0.01, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60)
+RATE_BUCKETS = (1, 5, 10, 20, 40, 60, 80, 100, 150, 200, 400)
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+
+# name: (help, buckets, GenerationStats attribute or None if observed directly)
+HISTOGRAMS = {
+    'summarizer_time_to_first_token_seconds': (
+        'Time from dispatch to the first generated token', SECONDS_BUCKETS, 'ttft'),
+    'summarizer_generation_seconds': (
+        'Wall time of a whole generation', SECONDS_BUCKETS, 'seconds'),
+    'summarizer_queue_wait_seconds': (
+        'Wall time not accounted for by Ollama (queueing before it started)',
+        SECONDS_BUCKETS, 'queue_wait'),
+    'summarizer_model_load_seconds': (
+        'Time Ollama spent loading the model', LOAD_BUCKETS, 'load_seconds'),
+    'summarizer_tokens_per_second': (
+        'Generation speed reported by Ollama', RATE_BUCKETS, 'tokens_per_second'),
+    'summarizer_prompt_tokens': (
+        'Prompt tokens evaluated per generation', TOKEN_BUCKETS, 'prompt_eval_count'),
+    'summarizer_completion_tokens': (
+        'Tokens generated per generation', TOKEN_BUCKETS, 'eval_count'),
+    'summarizer_admission_wait_seconds': (
+        'Time generations waited for a free slot, by lane', SECONDS_BUCKETS, None),
+}
+
+COUNTERS = {
+    'summarizer_generations_total': 'Upstream generations finished successfully',
+    'summarizer_errors_total': 'Upstream generations that failed, by kind',
+    'summarizer_admissions_total': 'Admission decisions by lane and outcome',
+    'summarizer_cancelled_total': 'Upstream generations stopped early, by reason',
+}
+
+
+def agent_label(agent):
+    """The display name AgentManager gives an agent instance, e.g. 'Story Board'"""
+    if getattr(agent, 'name', None):
+        return agent.name
+    name = re.sub(r'([A-Z])', r' \1', type(agent).__name__).strip()
+    return name.replace('Agent', '').strip()
+
+
+def is_timeout(error):
+    """True for connect/read timeouts from requests, httpx or the socket layer"""
+    if isinstance(error, (requests.exceptions.Timeout, socket.timeout, TimeoutError)):
+        return True
+    if 'Timeout' in type(error).__name__:
+        return True
+    # requests wraps a read timeout met mid-stream in a ConnectionError
+    return any('Timeout' in type(arg).__name__ for arg in getattr(error, 'args', ()))
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'total', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.total += value
+        self.count += 1
+
+
+def _labels(labels):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return ','.join(f'{key}="{escape(value)}"' for key, value in labels)
+
+
+class Metrics:
+    """Per-agent, per-model generation metrics in Prometheus text format"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {name: {} for name in HISTOGRAMS}
+        self.counters = {name: {} for name in COUNTERS}
+        self.gauges = {}
+
+    def _count(self, name, labels, amount=1):
+        series = self.counters[name]
+        series[labels] = series.get(labels, 0) + amount
+
+    def _observe(self, name, labels, value):
+        series = self.histograms[name]
+        histogram = series.get(labels)
+        if histogram is None:
+            histogram = series[labels] = Histogram(HISTOGRAMS[name][1])
+        histogram.observe(value)
+
+    def register_gauge(self, name, help_text, collect):
+        """Render a gauge whose series come from collect() -> {labels: value}"""
+        with self.lock:
+            self.gauges[name] = (help_text, collect)
+
+    def record_generation(self, agent, model, stats):
+        """Observe one finished generation's GenerationStats"""
+        labels = (('agent', agent), ('model', model))
+        with self.lock:
+            self._count('summarizer_generations_total', labels)
+            for name, (_, _, attribute) in HISTOGRAMS.items():
+                value = getattr(stats, attribute) if attribute else None
+                if value is not None:
+                    self._observe(name, labels, value)
+
+    def record_error(self, agent, model, kind):
+        """Count a failed generation; kind is 'timeout', 'unavailable' or 'stream'"""
+        labels = (('agent', agent), ('model', model), ('kind', kind))
+        with self.lock:
+            self._count('summarizer_errors_total', labels)
+
+    def record_cancelled(self, agent, model, reason):
+        """Count a generation stopped early; reason is 'disconnect' or 'deadline'"""
+        labels = (('agent', agent), ('model', model), ('reason', reason))
+        with self.lock:
+            self._count('summarizer_cancelled_total', labels)
+
+    def record_admission(self, lane, outcome, wait_seconds=None):
+        """Count an admission decision; outcome is 'admitted', 'rejected', 'timed_out' or 'cancelled'"""
+        with self.lock:
+            self._count('summarizer_admissions_total', (('lane', lane), ('outcome', outcome)))
+            if wait_seconds is not None:
+                self._observe('summarizer_admission_wait_seconds', (('lane', lane),),
+                              wait_seconds)
+
+    def render(self):
+        """Prometheus text exposition of every series"""
+        lines = []
+        with self.lock:
+            gauges = list(self.gauges.items())
+        # Collected outside the lock: gauge sources record metrics under their own locks
+        for name, (help_text, collect) in gauges:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} gauge')
+            for labels, value in sorted(collect().items()):
+                lines.append(f'{name}{{{_labels(labels)}}} {value}' if labels
+                             else f'{name} {value}')
+        with self.lock:
+            for name, help_text in COUNTERS.items():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} counter')
+                for labels, value in sorted(self.counters[name].items()):
+                    lines.append(f'{name}{{{_labels(labels)}}} {value}')
+            for name, (help_text, buckets, _) in HISTOGRAMS.items():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for labels, histogram in sorted(self.histograms[name].items()):
+                    cumulative = 0
+                    for bound, count in zip(buckets, histogram.counts):
+                        cumulative += count
+                        le = _labels(labels + (('le', bound),))
+                        lines.append(f'{name}_bucket{{{le}}} {cumulative}')
+                    le = _labels(labels + (('le', '+Inf'),))
+                    lines.append(f'{name}_bucket{{{le}}} {histogram.count}')
+                    lines.append(f'{name}_sum{{{_labels(labels)}}} {histogram.total}')
+                    lines.append(f'{name}_count{{{_labels(labels)}}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+
+_default_metrics = None
+_default_lock = threading.Lock()
+
+
+def get_metrics():
+    """Return the process-wide metrics registry"""
+    global _default_metrics
+    if _default_metrics is None:
+        with _default_lock:
+            if _default_metrics is None:
+                _default_metrics = Metrics()
+    return _default_metrics
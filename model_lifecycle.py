@@ -0,0 +1,230 @@
+import os
+import threading
+import time
+
+import requests
+
+from backend_pool import model_key
+from sizing import preload_num_ctx
+from transport import get_transport
+
+# How long Ollama keeps a model loaded after a request (Ollama's own default is 5m)
+DEFAULT_KEEP_ALIVE = os.environ.get('OLLAMA_KEEP_ALIVE', '30m')
+# Seconds between warm-up rounds; 0 only preloads at startup
+DEFAULT_WARM_INTERVAL = float(os.environ.get('OLLAMA_WARM_INTERVAL', 600))
+PRELOAD_TIMEOUT = (3.05, 300)
+PS_TIMEOUT = (2, 5)
+
+
+def parse_keep_alive_overrides(value):
+    """'llama3.2=-1,mistral=10m' -> {'llama3.2:latest': '-1', 'mistral:latest': '10m'}"""
+    overrides = {}
+    for item in value.split(','):
+        model, _, keep_alive = item.partition('=')
+        if model.strip() and keep_alive.strip():
+            overrides[model_key(model.strip())] = keep_alive.strip()
+    return overrides
+
+
+# Per-model keep_alive, e.g. pin the interactive model with -1
+KEEP_ALIVE_OVERRIDES = parse_keep_alive_overrides(os.environ.get('OLLAMA_MODEL_KEEP_ALIVE', ''))
+
+
+def keep_alive_for(model):
+    """The keep_alive to send with every request for a model
+
+    Ollama resets a model's unload timer to the keep_alive of each request,
+    so requests must carry the same value as the preload or they would cut
+    it back to Ollama's default.
+    """
+    keep_alive = KEEP_ALIVE_OVERRIDES.get(model_key(model), DEFAULT_KEEP_ALIVE)
+    try:
+        return int(keep_alive)
+    except ValueError:
+        return keep_alive
+
+
+def base_url(chat_url):
+    return chat_url.rsplit('/api/', 1)[0]
+
+
+class ModelState:
+    """Warm-up history of one model on one host"""
+
+    __slots__ = ('model', 'host', 'agents', 'warmups', 'cold_loads', 'last_warm',
+                 'last_load_seconds', 'last_error', 'resident', 'expires_at')
+
+    def __init__(self, model, host):
+        self.model = model
+        self.host = host
+        self.agents = []
+        self.warmups = 0
+        self.cold_loads = 0
+        self.last_warm = None
+        self.last_load_seconds = None
+        self.last_error = None
+        self.resident = None
+        self.expires_at = None
+
+    def to_dict(self):
+        return {
+            'model': self.model,
+            'host': self.host,
+            'agents': self.agents,
+            'keep_alive': keep_alive_for(self.model),
+            'resident': self.resident,
+            'expires_at': self.expires_at,
+            'warmups': self.warmups,
+            'cold_loads': self.cold_loads,
+            'last_warm': self.last_warm,
+            'last_load_seconds': self.last_load_seconds,
+            'last_error': self.last_error,
+        }
+
+
+class ModelLifecycle:
+    """Keep the models behind the registered agents loaded in Ollama
+
+    Preloads every agent's model at startup, then re-warms on a schedule:
+    each round asks /api/ps which models are resident and sends a load-only
+    request (no messages) with the model's keep_alive, which loads a model
+    that was evicted and pushes back the unload timer of one that was not.
+    """
+
+    def __init__(self, agent_manager, backend_pool=None, interval=DEFAULT_WARM_INTERVAL):
+        self.agent_manager = agent_manager
+        self.backend_pool = backend_pool
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.states = {}
+        self.rounds = 0
+        self.last_round = None
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def targets(self):
+        """{(host, model): [agent names]} for every registered agent
+
+        Builds the agents to learn their models, which imports every agent
+        module; start() does this off the request path.
+        """
+        targets = {}
+        for name in self.agent_manager.get_available_agents():
+            agent = self.agent_manager.get_agent_instance(name)
+            if agent is None or not getattr(agent, 'model', None):
+                continue
+            if self.backend_pool is not None:
+                hosts = [backend.base_url for backend in self.backend_pool.backends
+                         if backend.healthy and backend.has_model(agent.model)]
+            else:
+                hosts = [base_url(agent.url)]
+            for host in hosts:
+                targets.setdefault((host, model_key(agent.model)), []).append(name)
+        return targets
+
+    def resident(self, host):
+        """{model: expires_at} for the models a host has loaded, or None if unreachable"""
+        try:
+            response = get_transport().get(f"{host}/api/ps", timeout=PS_TIMEOUT)
+            response.raise_for_status()
+            return {model_key(m['name']): m.get('expires_at')
+                    for m in response.json().get('models', [])}
+        except (requests.exceptions.RequestException, ValueError, KeyError):
+            return None
+
+    def preload(self, host, model):
+        """Load a model (or refresh its keep_alive) with a request that has no messages
+
+        Loads it with the num_ctx requests last sent it, since Ollama reloads
+        a model loaded with any other. Returns the load time Ollama reports,
+        near 0 when it was already resident.
+        """
+        payload = {'model': model, 'messages': [], 'stream': False,
+                   'keep_alive': keep_alive_for(model),
+                   'options': {'num_ctx': preload_num_ctx(model)}}
+        response = get_transport().post(f"{host}/api/chat", json=payload,
+                                        timeout=PRELOAD_TIMEOUT)
+        response.raise_for_status()
+        return (response.json().get('load_duration') or 0) / 1e9
+
+    def warm(self):
+        """Run one warm-up round over every agent model; returns the states touched"""
+        targets = self.targets()
+        resident = {host: self.resident(host) for host in {host for host, _ in targets}}
+        touched = []
+        for (host, model), agents in targets.items():
+            with self.lock:
+                state = self.states.get((host, model))
+                if state is None:
+                    state = self.states[(host, model)] = ModelState(model, host)
+                state.agents = agents
+            loaded = resident[host]
+            was_resident = loaded is not None and model in loaded
+            try:
+                load_seconds = self.preload(host, model)
+            except (requests.exceptions.RequestException, ValueError) as e:
+                print(f"Warm-up of {model} on {host} failed: {e}")
+                with self.lock:
+                    state.last_error = str(e)
+                    state.resident = was_resident if loaded is not None else None
+                touched.append(state)
+                continue
+            with self.lock:
+                state.warmups += 1
+                if loaded is not None and not was_resident:
+                    state.cold_loads += 1
+                state.last_warm = time.time()
+                state.last_load_seconds = load_seconds
+                state.last_error = None
+                state.resident = True
+            touched.append(state)
+        self.refresh_resident()
+        with self.lock:
+            self.rounds += 1
+            self.last_round = time.time()
+        return touched
+
+    def refresh_resident(self):
+        """Update residency and expiry of every known model from /api/ps"""
+        with self.lock:
+            hosts = {state.host for state in self.states.values()}
+        for host in hosts:
+            loaded = self.resident(host)
+            with self.lock:
+                for state in self.states.values():
+                    if state.host != host:
+                        continue
+                    state.resident = None if loaded is None else state.model in loaded
+                    state.expires_at = loaded.get(state.model) if loaded else None
+
+    def start(self):
+        """Preload in the background now, then re-warm every interval (if > 0)"""
+        if self.thread is not None:
+            return
+
+        def loop():
+            while True:
+                try:
+                    self.warm()
+                except Exception as e:
+                    print(f"Model warm-up error: {e}")
+                if self.interval <= 0 or self.stop_event.wait(self.interval):
+                    return
+
+        self.thread = threading.Thread(target=loop, name='model-warmup', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def stats(self):
+        """Which agent models are resident where, and their warm-up history"""
+        self.refresh_resident()
+        with self.lock:
+            return {
+                'keep_alive': DEFAULT_KEEP_ALIVE,
+                'interval': self.interval,
+                'rounds': self.rounds,
+                'last_round': self.last_round,
+                'models': [state.to_dict() for state in self.states.values()],
+            }
@@ -0,0 +1,199 @@
+import json
+import time
+
+try:
+    import orjson
+except ImportError:  # optional: pip install orjson for a faster decode
+    orjson = None
+
+# Full JSON decode of one record: orjson when installed, else the stdlib
+decode_record = orjson.loads if orjson is not None else json.loads
+JSON_BACKEND = 'orjson' if orjson is not None else 'json'
+
+# Take the byte-level path for plain token records. It beats the stdlib
+# decode about 2x but loses to orjson, whose whole-record decode is faster
+# than the fast path's own checks (see chat_decode in benchmarks/run.py)
+FAST_PATH = orjson is None
+
+# Ollama writes compact JSON; a token record ends with its message content:
+# {"model":...,"created_at":...,"message":{"role":"assistant","content":"..."},"done":false}
+_CONTENT_MARKERS = {
+    bytes: (b'"message":{"role":"assistant","content":"', b'"},"done":false}', b'"', b'\\'),
+    str: ('"message":{"role":"assistant","content":"', '"},"done":false}', '"', '\\'),
+}
+
+
+class StreamError(Exception):
+    """Ollama sent an error record in the middle of a stream"""
+
+
+class GenerationStats:
+    """Timing and token counts for one upstream generation
+
+    Filled in while the NDJSON stream is decoded; the final record Ollama
+    sends (done: true) carries its own token counts and durations.
+    """
+
+    __slots__ = ('started', 'first_token', 'finished', 'decode_errors', 'done_reason', 'host',
+                 'prompt_eval_count', 'prompt_eval_duration', 'eval_count',
+                 'eval_duration', 'load_duration', 'total_duration')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first_token = None
+        self.finished = None
+        self.decode_errors = 0
+        self.done_reason = None
+        # Base URL of the Ollama host that served the generation
+        self.host = None
+        self.prompt_eval_count = None
+        self.prompt_eval_duration = None
+        self.eval_count = None
+        self.eval_duration = None
+        self.load_duration = None
+        self.total_duration = None
+
+    def finish(self, record):
+        """Take the counters from Ollama's final stream record"""
+        self.finished = time.perf_counter()
+        self.done_reason = record.get('done_reason')
+        self.prompt_eval_count = record.get('prompt_eval_count')
+        self.prompt_eval_duration = record.get('prompt_eval_duration')
+        self.eval_count = record.get('eval_count')
+        self.eval_duration = record.get('eval_duration')
+        self.load_duration = record.get('load_duration')
+        self.total_duration = record.get('total_duration')
+
+    @property
+    def complete(self):
+        """Whether the final record arrived; without it the reply may be cut short"""
+        return self.finished is not None
+
+    @property
+    def ttft(self):
+        if self.first_token is None:
+            return None
+        return self.first_token - self.started
+
+    @property
+    def seconds(self):
+        if self.finished is None:
+            return None
+        return self.finished - self.started
+
+    @property
+    def tokens_per_second(self):
+        if not self.eval_count or not self.eval_duration:
+            return None
+        return self.eval_count / (self.eval_duration / 1e9)
+
+    @property
+    def load_seconds(self):
+        return self.load_duration / 1e9 if self.load_duration is not None else None
+
+    @property
+    def queue_wait(self):
+        """Wall time Ollama did not account for: queueing and transfer before it started"""
+        if self.seconds is None or self.total_duration is None:
+            return None
+        return max(0.0, self.seconds - self.total_duration / 1e9)
+
+    def to_dict(self):
+        return {
+            'ttft_seconds': self.ttft,
+            'seconds': self.seconds,
+            'queue_wait_seconds': self.queue_wait,
+            'load_seconds': self.load_seconds,
+            'prompt_tokens': self.prompt_eval_count,
+            'completion_tokens': self.eval_count,
+            'tokens_per_second': self.tokens_per_second,
+            'done_reason': self.done_reason,
+            'host': self.host,
+        }
+
+
+def fast_content(line):
+    """message.content of a plain token record without a JSON decode, or None
+
+    Only a record in Ollama's exact layout whose content has no quote or
+    escape qualifies: then the bytes between the markers are the string
+    itself. Anything else (escapes such as \\n, the final record, other
+    fields) returns None and takes the full decode.
+    """
+    markers = _CONTENT_MARKERS.get(type(line))
+    if markers is None:
+        return None
+    start, end, quote, backslash = markers
+    if not line.endswith(end):
+        return None
+    i = line.find(start)
+    if i < 0:
+        return None
+    content = line[i + len(start):len(line) - len(end)]
+    if quote in content or backslash in content:
+        return None
+    if type(content) is bytes:
+        try:
+            return content.decode('utf-8')
+        except UnicodeDecodeError:
+            return None
+    return content
+
+
+def chat_content(line, stats=None):
+    """Decode one /api/chat NDJSON line and return its message content
+
+    Returns '' for records without content and for lines that do not
+    decode (counted in stats.decode_errors). The final record updates stats.
+    Raises StreamError for an error record, such as a crashed model runner.
+    """
+    content = fast_content(line) if FAST_PATH else None
+    if content is not None:
+        if stats is not None and content and stats.first_token is None:
+            stats.first_token = time.perf_counter()
+        return content
+    try:
+        record = decode_record(line)
+    except ValueError as e:
+        print(f"[Error decoding JSON in stream: {e}]")
+        if stats is not None:
+            stats.decode_errors += 1
+        return ''
+    if record.get('error'):
+        raise StreamError(record['error'])
+    content = record.get('message', {}).get('content', '')
+    if stats is not None:
+        if content and stats.first_token is None:
+            stats.first_token = time.perf_counter()
+        if record.get('done'):
+            stats.finish(record)
+    return content
+
+
+def iter_chat_content(lines, stats=None):
+    """Yield the message content from an iterable of NDJSON lines (bytes or str)"""
+    for line in lines:
+        if line:
+            content = chat_content(line, stats)
+            if content:
+                yield content
+
+
+def print_content(content):
+    """on_content callback that echoes the reply to the terminal as it streams"""
+    print(content, end='', flush=True)
+
+
+def read_chat_reply(lines, stats=None, on_content=None):
+    """Decode a whole NDJSON stream and return the reply text
+
+    Collects the pieces in a list and joins once, so a long reply costs
+    one copy rather than one per token. on_content sees each piece as it
+    arrives.
+    """
+    parts = []
+    for content in iter_chat_content(lines, stats):
+        if on_content is not None:
+            on_content(content)
+        parts.append(content)
+    return ''.join(parts)
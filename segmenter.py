@@ -0,0 +1,216 @@
+import os
+import re
+import time
+
+
+DEFAULT_MAX_CHARS = 2000
+# Seconds streamed text may wait for a sentence end before it is sent anyway
+DEFAULT_MAX_DELAY = float(os.environ.get('SEGMENT_MAX_DELAY', 3)) or None
+
+# Characters that can end a segment outside code fences
+SPECIAL = re.compile(r'[.!?\n]')
+LIST_MARKER = re.compile(r'(?:[-*+]|\d{1,3}[.)])[ \t]')
+# A line head that could still turn into a list marker with more input
+LIST_PREFIX = re.compile(r'(?:[-*+]|\d{1,3}[.)]?)')
+FENCE_PREFIXES = ('`', '``', '~', '~~')
+HEAD_LOOKAHEAD = 6
+
+
+class StreamSegmenter:
+    """Incremental sentence/paragraph splitter for streamed model output
+
+    Every character is scanned once: the scan position and the
+    sentence/paragraph/code-fence state are kept between chunks, and
+    pending text is held as a list of pieces that is joined only when a
+    segment is emitted. Fenced code blocks (```/~~~) are emitted whole,
+    markdown list items start a new segment, and pending text is flushed
+    once it exceeds max_chars or has waited longer than max_delay seconds.
+    """
+
+    def __init__(self, max_chars=DEFAULT_MAX_CHARS, max_delay=None, clock=time.monotonic):
+        self.max_chars = max_chars
+        self.max_delay = max_delay
+        self.clock = clock
+        self.reset()
+
+    def reset(self):
+        self.parts = []
+        self.pending_len = 0
+        self.pending_since = None
+        self.carry = ''
+        self.after_punct = False
+        self.line_has_text = False
+        self.newlines = 0
+        self.at_line_start = True
+        self.in_fence = False
+        self.closing_fence = False
+        self.skip_line = False
+
+    def _cut(self, chunk, start, end, out):
+        """Emit pending pieces plus chunk[start:end] as one segment"""
+        if self.parts:
+            self.parts.append(chunk[start:end])
+            text = ''.join(self.parts)
+            self.parts = []
+        else:
+            text = chunk[start:end]
+        self.pending_len = 0
+        self.pending_since = None
+        segment = text.strip()
+        if segment:
+            out.append(segment)
+        return end
+
+    def _classify_line(self, chunk, i):
+        """Look at the head of the line starting at i: 'fence', 'list' or 'text'
+
+        Returns (kind, marker_length), or None when the chunk ends before
+        the line head can be classified.
+        """
+        n = len(chunk)
+        j = i
+        while j < n and chunk[j] in ' \t':
+            j += 1
+        head = chunk[j:j + HEAD_LOOKAHEAD]
+        if head.startswith('```') or head.startswith('~~~'):
+            return 'fence', j - i + 3
+        match = LIST_MARKER.match(head)
+        if match:
+            return 'list', j - i + match.end()
+        if j + len(head) >= n and (not head or head in FENCE_PREFIXES
+                                   or LIST_PREFIX.fullmatch(head)):
+            return None
+        return 'text', 0
+
+    def feed(self, chunk, now=None):
+        """Consume a chunk of text and return the list of completed segments"""
+        out = []
+        if self.carry:
+            chunk = self.carry + chunk
+            self.carry = ''
+        n = len(chunk)
+        start = 0
+        i = 0
+
+        while i < n:
+            if self.at_line_start:
+                kind = self._classify_line(chunk, i)
+                if kind is None:
+                    # Hold the undecided line head back until more text arrives
+                    self.carry = chunk[i:]
+                    n = i
+                    break
+                self.at_line_start = False
+                kind, length = kind
+                if kind == 'fence':
+                    if self.in_fence:
+                        self.in_fence = False
+                        self.closing_fence = True
+                    else:
+                        start = self._cut(chunk, start, i, out)
+                        self.in_fence = True
+                    self.after_punct = False
+                    self.skip_line = True
+                    i += length
+                    continue
+                if kind == 'list' and not self.in_fence:
+                    start = self._cut(chunk, start, i, out)
+                    self.after_punct = False
+                    self.line_has_text = True
+                    # Skip the marker so "1." is not read as a sentence end
+                    i += length
+                    continue
+
+            if self.in_fence or self.skip_line or self.closing_fence:
+                j = chunk.find('\n', i)
+                if j < 0:
+                    i = n
+                    break
+                if self.closing_fence:
+                    start = self._cut(chunk, start, j + 1, out)
+                    self.closing_fence = False
+                self.skip_line = False
+                self.line_has_text = False
+                self.newlines = 1
+                self.at_line_start = True
+                i = j + 1
+                continue
+
+            if self.after_punct:
+                self.after_punct = False
+                if chunk[i].isspace():
+                    start = self._cut(chunk, start, i, out)
+                    continue
+
+            match = SPECIAL.search(chunk, i)
+            if match is None:
+                if not chunk[i:].isspace():
+                    self.line_has_text = True
+                i = n
+                break
+            j = match.start()
+            if j > i and not chunk[i:j].isspace():
+                self.line_has_text = True
+
+            if chunk[j] == '\n':
+                if self.line_has_text:
+                    self.newlines = 1
+                else:
+                    self.newlines += 1
+                    if self.newlines >= 2:
+                        start = self._cut(chunk, start, j + 1, out)
+                self.line_has_text = False
+                self.at_line_start = True
+                i = j + 1
+                continue
+
+            # Sentence punctuation ends a segment when whitespace follows it
+            self.line_has_text = True
+            if j + 1 < n:
+                if chunk[j + 1].isspace():
+                    start = self._cut(chunk, start, j + 1, out)
+            else:
+                self.after_punct = True
+            i = j + 1
+
+        if start < n:
+            self.parts.append(chunk[start:n])
+            self.pending_len += n - start
+
+        if self.pending_len:
+            if self.pending_len > self.max_chars:
+                self._cut('', 0, 0, out)
+            elif self.max_delay is not None:
+                now = self.clock() if now is None else now
+                if self.pending_since is None:
+                    self.pending_since = now
+                elif now - self.pending_since >= self.max_delay:
+                    self._cut('', 0, 0, out)
+        return out
+
+    def poll(self, now=None):
+        """Flush pending text that has waited longer than max_delay
+
+        For callers that wake up on a timer while no chunk arrives.
+        """
+        out = []
+        if self.pending_len and self.max_delay is not None and self.pending_since is not None:
+            now = self.clock() if now is None else now
+            if now - self.pending_since >= self.max_delay:
+                self._cut('', 0, 0, out)
+        return out
+
+    def flush(self):
+        """Emit whatever is left at the end of the stream and reset"""
+        out = []
+        self._cut(self.carry, 0, len(self.carry), out)
+        self.reset()
+        return out
+
+
+def paragraph_segments(chunks, **options):
+    """Regroup a stream of text chunks into sentences/paragraphs"""
+    segmenter = StreamSegmenter(**options)
+    for chunk in chunks:
+        yield from segmenter.feed(chunk)
+    yield from segmenter.flush()
@@ -0,0 +1,488 @@
+import asyncio
+import os
+import threading
+import time
+
+from admission import INTERACTIVE, Overloaded, Withdrawn, get_admission
+from metrics import get_metrics, is_timeout
+from ollama_stream import GenerationStats, iter_chat_content
+from summary_cache import cache_key, get_summary_cache
+from transport import CancelScope, cancellable
+
+
+class FlightError(Exception):
+    """The shared generation failed; raised to every subscriber"""
+
+
+class UpstreamUnavailable(FlightError):
+    """The backend could not be reached or refused the request"""
+
+
+class GenerationCancelled(FlightError):
+    """Every subscriber left before the generation finished, so it was stopped"""
+
+
+class DeadlineExceeded(Exception):
+    """The request's deadline passed before its summary was complete"""
+
+
+# Seconds a request may take end to end unless it sets "deadline"; unset = no limit
+DEFAULT_DEADLINE = float(os.environ.get('REQUEST_DEADLINE', 0)) or None
+
+
+def parse_deadline(value):
+    """Turn a client-supplied deadline in seconds into a time.monotonic() instant"""
+    try:
+        seconds = float(value) if value else DEFAULT_DEADLINE
+    except (TypeError, ValueError):
+        seconds = DEFAULT_DEADLINE
+    if not seconds or seconds <= 0:
+        return None
+    return time.monotonic() + seconds
+
+
+def _remaining(deadline):
+    return None if deadline is None else deadline - time.monotonic()
+
+
+class Flight:
+    """One upstream generation that any number of subscribers can follow"""
+
+    def __init__(self, key, lane=INTERACTIVE, on_leave=None, prefer=None):
+        self.key = key
+        self.lane = lane
+        # Host to run on while it has a free slot
+        self.prefer = prefer
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.partial = False
+        self.subscribers = 1
+        # Why the generation was stopped once every subscriber left
+        self.cancelled = None
+        # Aborts the admission wait or the upstream request once they have
+        self.cancel_scope = CancelScope()
+        self.on_leave = on_leave
+        self.stats = GenerationStats()
+        self.admitted = threading.Event()
+        self.condition = threading.Condition()
+
+    def add(self, chunk):
+        with self.condition:
+            self.chunks.append(chunk)
+            self.condition.notify_all()
+
+    def finish(self, error=None):
+        with self.condition:
+            self.done = True
+            self.error = error
+            self.condition.notify_all()
+        self.admitted.set()
+
+    def leave(self, reason='disconnect'):
+        """Stop following the generation; the last subscriber to leave cancels it"""
+        if self.on_leave is not None and not self.done:
+            self.on_leave(self, reason)
+
+    def admission(self, deadline=None):
+        """Block until the generation has a slot; raises Overloaded if it was turned away"""
+        if not self.admitted.wait(_remaining(deadline)):
+            self.leave('deadline')
+            raise DeadlineExceeded('Deadline exceeded waiting for a generation slot')
+        if isinstance(self.error, Overloaded):
+            raise self.error
+
+    def _wait(self, deadline, tick=None):
+        """Wait for a change under the condition; False once the deadline has passed"""
+        remaining = _remaining(deadline)
+        if remaining is not None and remaining <= 0:
+            return False
+        if tick is not None:
+            remaining = tick if remaining is None else min(remaining, tick)
+        self.condition.wait(remaining)
+        return True
+
+    def subscribe(self, deadline=None, tick=None):
+        """Yield the chunks produced so far, then the live tail
+
+        With tick, an empty chunk is yielded whenever tick seconds pass
+        with no output, so the caller can run its periodic checks during
+        a long prefill or a stall. Closing the iterator early (the client
+        went away) or running past the deadline leaves the flight.
+        """
+        index = 0
+        finished = False
+        reason = 'disconnect'
+        try:
+            while True:
+                with self.condition:
+                    while index >= len(self.chunks) and not self.done:
+                        if not self._wait(deadline, tick):
+                            reason = 'deadline'
+                            raise DeadlineExceeded('Deadline exceeded')
+                        if tick is not None:
+                            break
+                    batch = self.chunks[index:]
+                    index += len(batch)
+                    finished = self.done and index >= len(self.chunks)
+                if batch:
+                    yield from batch
+                elif not finished:
+                    yield ''
+                if finished:
+                    if self.error is not None:
+                        raise self.error
+                    return
+        finally:
+            if not finished:
+                self.leave(reason)
+
+    def text(self, deadline=None):
+        """Block until the generation finishes and return the full reply"""
+        with self.condition:
+            while not self.done:
+                if not self._wait(deadline):
+                    break
+        if not self.done:
+            self.leave('deadline')
+            raise DeadlineExceeded('Deadline exceeded')
+        if self.error is not None:
+            raise self.error
+        return ''.join(self.chunks)
+
+
+class SingleFlight:
+    """Coalesce identical in-flight generations into one upstream request
+
+    Requests are identical when their payloads share a summary cache key
+    (same model, options and normalized messages). The first request
+    starts the generation on a background thread; later ones attach to it.
+    A finished generation is written to the summary cache before it leaves
+    the in-flight table, so there is no window where neither serves it.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flights = {}
+        self.counters = {'started': 0, 'coalesced': 0, 'cancelled': 0}
+
+    def join(self, payload, open_stream, agent='', lane=INTERACTIVE, prefer=None):
+        """Return the Flight for payload, starting it with open_stream(payload, host) if needed
+
+        agent only labels the generation's metrics. A new generation waits
+        for an admission slot in lane, on prefer while that host has room,
+        and is then sent to the slot's host; requests joining it meanwhile
+        share its place in the queue. Every caller
+        either follows the flight to the end or calls flight.leave() (closing
+        subscribe() early does that); once all have left, the generation
+        drops out of the admission queue or its upstream connection is shut
+        down right away, without waiting for the next token.
+        """
+        key = cache_key(payload)
+        with self.lock:
+            flight = self.flights.get(key)
+            if flight is not None:
+                flight.subscribers += 1
+                self.counters['coalesced'] += 1
+                return flight
+            flight = self.flights[key] = Flight(key, lane, self._leave, prefer)
+            self.counters['started'] += 1
+
+        threading.Thread(
+            target=self._produce,
+            args=(flight, payload, open_stream, agent),
+            name='single-flight',
+            daemon=True,
+        ).start()
+        return flight
+
+    def _produce(self, flight, payload, open_stream, agent):
+        try:
+            ticket = get_admission().acquire(flight.lane, model=payload['model'],
+                                             prefer=flight.prefer, cancel=flight.cancel_scope)
+        except Overloaded as e:
+            with self.lock:
+                if self.flights.get(flight.key) is flight:
+                    del self.flights[flight.key]
+            flight.finish(e)
+            return
+        except Withdrawn:
+            # Cancelled while queued; _leave already took it out of the table
+            get_metrics().record_cancelled(agent, payload['model'], flight.cancelled)
+            flight.finish(GenerationCancelled(flight.cancelled))
+            return
+        flight.admitted.set()
+        # Generation stats cover the upstream request, not the admission wait
+        flight.stats.started = time.perf_counter()
+        try:
+            self._generate(flight, payload, open_stream, agent, ticket.host)
+        finally:
+            ticket.release()
+
+    def _leave(self, flight, reason):
+        with self.lock:
+            flight.subscribers -= 1
+            if flight.subscribers > 0 or flight.done or flight.cancelled:
+                return
+            # Nobody is reading any more; new identical requests start afresh
+            flight.cancelled = reason
+            if self.flights.get(flight.key) is flight:
+                del self.flights[flight.key]
+            self.counters['cancelled'] += 1
+        flight.cancel_scope.cancel()
+
+    def _generate(self, flight, payload, open_stream, agent, host):
+        error = None
+        kind = None
+        try:
+            if flight.cancelled:
+                raise GenerationCancelled(flight.cancelled)
+            with cancellable(flight.cancel_scope):
+                response = open_stream(payload, host)
+            if not response:
+                raise UpstreamUnavailable("Failed to get response from the API.")
+            flight.stats.host = getattr(response, 'ollama_host', None)
+            try:
+                # Closing the response mid-stream drops the connection, which
+                # stops Ollama generating; _leave shuts it down from outside
+                for content in iter_chat_content(response.iter_lines(), flight.stats):
+                    if flight.cancelled:
+                        raise GenerationCancelled(flight.cancelled)
+                    flight.add(content)
+            finally:
+                response.close()
+            # Only a reply that reached Ollama's final record is whole
+            flight.partial = flight.stats.decode_errors > 0 or not flight.stats.complete
+        except GenerationCancelled as e:
+            error, kind = e, 'cancelled'
+        except UpstreamUnavailable as e:
+            error, kind = e, 'unavailable'
+        except FlightError as e:
+            error, kind = e, 'stream'
+        except Exception as e:
+            error, kind = FlightError(str(e)), 'timeout' if is_timeout(e) else 'stream'
+        if error is not None and flight.cancelled:
+            # The failure is the connection _leave shut down
+            error, kind = GenerationCancelled(flight.cancelled), 'cancelled'
+
+        if error is None:
+            get_metrics().record_generation(agent, payload['model'], flight.stats)
+            if not flight.partial:
+                get_summary_cache().put(payload, ''.join(flight.chunks))
+        elif kind == 'cancelled':
+            get_metrics().record_cancelled(agent, payload['model'], flight.cancelled)
+        else:
+            get_metrics().record_error(agent, payload['model'], kind)
+        with self.lock:
+            if self.flights.get(flight.key) is flight:
+                del self.flights[flight.key]
+        flight.finish(error)
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+            stats['in_flight'] = len(self.flights)
+        return stats
+
+
+class AsyncFlight:
+    """asyncio counterpart of Flight for the async app"""
+
+    def __init__(self, key, lane=INTERACTIVE, on_leave=None, prefer=None):
+        self.key = key
+        self.lane = lane
+        self.prefer = prefer
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.partial = False
+        self.subscribers = 1
+        self.cancelled = None
+        self.on_leave = on_leave
+        self.task = None
+        self.stats = GenerationStats()
+        self.admitted = asyncio.Event()
+        self.changed = asyncio.Event()
+
+    def _notify(self):
+        # Wake current waiters and arm a fresh event for the next change
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+    def add(self, chunk):
+        self.chunks.append(chunk)
+        self._notify()
+
+    def finish(self, error=None):
+        self.done = True
+        self.error = error
+        self._notify()
+        self.admitted.set()
+
+    def leave(self, reason='disconnect'):
+        if self.on_leave is not None and not self.done:
+            self.on_leave(self, reason)
+
+    async def admission(self, deadline=None):
+        try:
+            await asyncio.wait_for(self.admitted.wait(), _remaining(deadline))
+        except asyncio.TimeoutError:
+            self.leave('deadline')
+            raise DeadlineExceeded('Deadline exceeded waiting for a generation slot')
+        if isinstance(self.error, Overloaded):
+            raise self.error
+
+    async def subscribe(self, deadline=None, tick=None):
+        """Yield the chunks so far, then the live tail; leaves the flight if abandoned
+
+        tick works as in Flight.subscribe(). A client disconnect cancels
+        the consuming task, which raises CancelledError at the wait below.
+        """
+        index = 0
+        finished = False
+        reason = 'disconnect'
+        try:
+            while True:
+                while index >= len(self.chunks) and not self.done:
+                    remaining = _remaining(deadline)
+                    wait = remaining if tick is None else (
+                        tick if remaining is None else min(remaining, tick))
+                    try:
+                        await asyncio.wait_for(self.changed.wait(), wait)
+                    except asyncio.TimeoutError:
+                        if remaining is not None and wait >= remaining:
+                            reason = 'deadline'
+                            raise DeadlineExceeded('Deadline exceeded')
+                        break
+                batch = self.chunks[index:]
+                index += len(batch)
+                finished = self.done and index >= len(self.chunks)
+                if not batch and not finished:
+                    yield ''
+                for chunk in batch:
+                    yield chunk
+                if finished:
+                    if self.error is not None:
+                        raise self.error
+                    return
+        finally:
+            if not finished:
+                self.leave(reason)
+
+    async def text(self, deadline=None):
+        parts = []
+        async for chunk in self.subscribe(deadline):
+            parts.append(chunk)
+        return ''.join(parts)
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines: the generation runs as an asyncio task
+
+    When every subscriber has left, the task is cancelled, which closes the
+    upstream HTTP stream (or drops its place in the admission queue) at once.
+    """
+
+    def __init__(self):
+        self.flights = {}
+        self.tasks = set()
+        self.counters = {'started': 0, 'coalesced': 0, 'cancelled': 0}
+
+    def join(self, payload, open_chunks, agent='', lane=INTERACTIVE, prefer=None):
+        """Return the AsyncFlight for payload, starting open_chunks(payload, stats, host) if needed"""
+        key = cache_key(payload)
+        flight = self.flights.get(key)
+        if flight is not None:
+            flight.subscribers += 1
+            self.counters['coalesced'] += 1
+            return flight
+        flight = self.flights[key] = AsyncFlight(key, lane, self._leave, prefer)
+        self.counters['started'] += 1
+        task = flight.task = asyncio.ensure_future(
+            self._produce(flight, payload, open_chunks, agent))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return flight
+
+    def _leave(self, flight, reason):
+        flight.subscribers -= 1
+        if flight.subscribers > 0 or flight.done or flight.cancelled:
+            return
+        flight.cancelled = reason
+        self._forget(flight)
+        self.counters['cancelled'] += 1
+        flight.task.cancel()
+
+    def _forget(self, flight):
+        if self.flights.get(flight.key) is flight:
+            del self.flights[flight.key]
+
+    async def _produce(self, flight, payload, open_chunks, agent):
+        try:
+            ticket = await get_admission().acquire_async(flight.lane, model=payload['model'],
+                                                         prefer=flight.prefer)
+        except Overloaded as e:
+            self._forget(flight)
+            flight.finish(e)
+            return
+        except asyncio.CancelledError:
+            # Cancelled while queued: acquire_async already gave up its place
+            reason = flight.cancelled or 'cancelled'
+            get_metrics().record_cancelled(agent, payload['model'], reason)
+            self._forget(flight)
+            flight.finish(GenerationCancelled(reason))
+            return
+        flight.admitted.set()
+        flight.stats.started = time.perf_counter()
+        try:
+            await self._generate(flight, payload, open_chunks, agent, ticket.host)
+        except asyncio.CancelledError:
+            reason = flight.cancelled or 'cancelled'
+            get_metrics().record_cancelled(agent, payload['model'], reason)
+            self._forget(flight)
+            flight.finish(GenerationCancelled(reason))
+        finally:
+            ticket.release()
+
+    async def _generate(self, flight, payload, open_chunks, agent, host):
+        error = None
+        try:
+            async for chunk in open_chunks(payload, flight.stats, host):
+                flight.add(chunk)
+            # Only a reply that reached Ollama's final record is whole
+            flight.partial = flight.stats.decode_errors > 0 or not flight.stats.complete
+        except Exception as e:
+            error = e if isinstance(e, FlightError) else FlightError(str(e))
+            if not flight.chunks:
+                error = UpstreamUnavailable(str(e))
+            kind = 'timeout' if is_timeout(e) else (
+                'unavailable' if isinstance(error, UpstreamUnavailable) else 'stream')
+
+        if error is None:
+            get_metrics().record_generation(agent, payload['model'], flight.stats)
+            if not flight.partial:
+                # Off the event loop: the write goes to SQLite
+                await asyncio.to_thread(get_summary_cache().put, payload, ''.join(flight.chunks))
+        else:
+            get_metrics().record_error(agent, payload['model'], kind)
+        self._forget(flight)
+        flight.finish(error)
+
+    def stats(self):
+        stats = dict(self.counters)
+        stats['in_flight'] = len(self.flights)
+        return stats
+
+
+_default_flights = None
+_default_lock = threading.Lock()
+
+
+def get_single_flight():
+    """Return the process-wide single-flight table shared by every agent"""
+    global _default_flights
+    if _default_flights is None:
+        with _default_lock:
+            if _default_flights is None:
+                _default_flights = SingleFlight()
+    return _default_flights
@@ -0,0 +1,130 @@
+import os
+
+from backend_pool import model_key
+
+# Largest num_ctx a request is sent with, unless OLLAMA_MODEL_NUM_CTX overrides it for the model
+MAX_CONTEXT = int(os.environ.get('OLLAMA_MAX_CTX', 8192))
+# Smallest num_ctx, Ollama's own default; windows grow from it in powers of two
+MIN_CONTEXT = int(os.environ.get('OLLAMA_MIN_CTX', 2048))
+DEFAULT_NUM_PREDICT = 1024
+# Per-message chat template tokens (role markers, separators)
+MESSAGE_OVERHEAD = 8
+# Headroom for estimator error on the prompt side
+PROMPT_MARGIN = 1.1
+# What to do with input that cannot fit: 'chunk' routes it to map-reduce,
+# 'reject' answers 413
+OVERSIZE_POLICY = os.environ.get('OVERSIZE_POLICY', 'chunk')
+
+
+def estimate_tokens(text):
+    """Cheap token estimate without a tokenizer
+
+    About 4 characters per token for ASCII text. Other scripts use more
+    tokens per character, so they are estimated from the UTF-8 length
+    (roughly one token per CJK character).
+    """
+    if text.isascii():
+        return len(text) // 4 + 1
+    return len(text.encode('utf-8')) // 3 + 1
+
+
+def parse_num_ctx_overrides(value):
+    """'llama3.2=8192,qwen2.5=32768' -> {'llama3.2:latest': 8192, 'qwen2.5:latest': 32768}"""
+    overrides = {}
+    for item in value.split(','):
+        model, _, num_ctx = item.partition('=')
+        if model.strip() and num_ctx.strip():
+            overrides[model_key(model.strip())] = int(num_ctx)
+    return overrides
+
+
+# Per-model num_ctx, e.g. a larger window for a long-context model
+NUM_CTX_OVERRIDES = parse_num_ctx_overrides(os.environ.get('OLLAMA_MODEL_NUM_CTX', ''))
+
+
+def num_ctx_for(model):
+    """The largest num_ctx a request for a model is sent with"""
+    if not model:
+        return MAX_CONTEXT
+    return NUM_CTX_OVERRIDES.get(model_key(model), MAX_CONTEXT)
+
+
+def context_step(tokens, max_context):
+    """The smallest power of two from MIN_CONTEXT that holds tokens, at most max_context
+
+    Ollama reloads a model whenever num_ctx changes, waiting for its
+    running requests to drain first, so windows come in a few fixed steps
+    rather than fitted exactly to each input.
+    """
+    num_ctx = MIN_CONTEXT
+    while num_ctx < tokens and num_ctx < max_context:
+        num_ctx *= 2
+    return min(num_ctx, max_context)
+
+
+# The num_ctx last sent per model, so a preload does not reload it at another size
+_sent_num_ctx = {}
+
+
+def record_num_ctx(payload):
+    """Note the num_ctx of a chat payload that Ollama accepted"""
+    num_ctx = payload.get('options', {}).get('num_ctx')
+    if num_ctx:
+        _sent_num_ctx[model_key(payload['model'])] = num_ctx
+
+
+def preload_num_ctx(model):
+    """The num_ctx a model was last sent with, or the smallest step before any request"""
+    return _sent_num_ctx.get(model_key(model), context_step(0, num_ctx_for(model)))
+
+
+def oversize_rejection(sizing):
+    """The 413 body for input too long for one request, or None to chunk it instead
+
+    sizing is a plan's to_dict(), or {agent: to_dict()} for several agents.
+    """
+    if OVERSIZE_POLICY != 'reject':
+        return None
+    return {'error': 'Text is too long for one request; send it with "chunked": true',
+            'sizing': sizing}
+
+
+class ContextPlan:
+    """The num_ctx / num_predict sent with one request and whether the prompt fits"""
+
+    __slots__ = ('prompt_tokens', 'num_predict', 'num_ctx', 'max_context')
+
+    def __init__(self, prompt_tokens, num_predict, num_ctx, max_context):
+        self.prompt_tokens = prompt_tokens
+        self.num_predict = num_predict
+        self.num_ctx = num_ctx
+        self.max_context = max_context
+
+    @property
+    def fits(self):
+        return self.prompt_tokens + self.num_predict <= self.max_context
+
+    def options(self):
+        return {'num_ctx': self.num_ctx, 'num_predict': self.num_predict}
+
+    def to_dict(self):
+        return {
+            'prompt_tokens': self.prompt_tokens,
+            'num_predict': self.num_predict,
+            'num_ctx': self.num_ctx,
+            'max_context': self.max_context,
+            'fits': self.fits,
+        }
+
+
+def plan_context(messages, num_predict=DEFAULT_NUM_PREDICT, model=None):
+    """Size a chat's window to its prompt estimate plus the output budget
+
+    A conversation only grows, so each follow-up gets the same step as the
+    turn before or a larger one.
+    """
+    max_context = num_ctx_for(model)
+    prompt_tokens = int(sum(estimate_tokens(m['content']) + MESSAGE_OVERHEAD
+                            for m in messages) * PROMPT_MARGIN)
+    num_ctx = context_step(prompt_tokens + num_predict, max_context)
+    return ContextPlan(prompt_tokens, num_predict, num_ctx, max_context)
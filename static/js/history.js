@@ -1,12 +1,16 @@
-export async function loadHistory(displayHistory) {
-    const res = await fetch('/history');
-    const history = await res.json();
-    displayHistory(history);
+let nextCursor = null;
+
+export async function loadHistory(displayHistory, cursor = null) {
+    const url = cursor ? `/history?cursor=${encodeURIComponent(cursor)}` : '/history';
+    const res = await fetch(url);
+    const page = await res.json();
+    nextCursor = page.next_cursor;
+    displayHistory(page.items, Boolean(cursor));
 }
 
-export function displayHistory(history) {
+export function displayHistory(history, append = false) {
     const container = document.getElementById('historyContainer');
-    if (!history.length) {
+    if (!history.length && !append) {
         container.innerHTML = `
             <div class="empty-state">
                 <i class="fas fa-clipboard-list"></i>
@@ -15,7 +19,8 @@ export function displayHistory(history) {
         return;
     }
 
-    container.innerHTML = history.reverse().map(item => `
+    // Entries arrive newest first, one page at a time
+    const items = history.map(item => `
         <div class="history-item p-3">
             <div class="d-flex justify-content-between">
                 <span class="badge bg-primary">${item.agent}</span>
@@ -31,6 +36,19 @@ export function displayHistory(history) {
             </div>
         </div>
     `).join('');
+
+    document.getElementById('loadMoreHistory')?.remove();
+    if (append) container.insertAdjacentHTML('beforeend', items);
+    else container.innerHTML = items;
+
+    if (nextCursor) {
+        container.insertAdjacentHTML('beforeend', `
+            <button type="button" class="btn btn-outline-secondary btn-sm w-100 mt-2" id="loadMoreHistory">
+                Load more
+            </button>`);
+        document.getElementById('loadMoreHistory')
+            .addEventListener('click', () => loadHistory(displayHistory, nextCursor));
+    }
 }
 
 export async function clearHistory(callback) {
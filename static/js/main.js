@@ -78,10 +78,15 @@ async function standardSummary(text, agent, startTime) {
     }
 }
 
-// Simplified streaming (uses TextDecoder instead of EventSource)
+// Server-sent events read with fetch (EventSource cannot POST). After a
+// dropped connection the stream is resumed with Last-Event-ID; the server
+// keeps the generation running meanwhile and replays what was missed.
+const MAX_RESUME_ATTEMPTS = 5;
+
 async function streamSummary(text, agent, startTime) {
+    const state = { summary: '', lastEventId: 0, done: false, error: null };
     try {
-        const res = await fetch('/summarize_stream', {
+        let res = await fetch('/summarize_stream', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({ text, agent })
@@ -92,25 +97,35 @@ async function streamSummary(text, agent, startTime) {
             return;
         }
 
-        const reader = res.body.getReader();
-        const decoder = new TextDecoder('utf-8');
-        let summary = '';
-
+        const streamId = res.headers.get('X-Request-Id');
         summaryContent.innerHTML = '';
 
-        while (true) {
-            const { done, value } = await reader.read();
-            if (done) break;
-
-            const chunk = decoder.decode(value, { stream: true });
-            if (!chunk.trim()) continue;
+        for (let attempt = 0; ; attempt++) {
+            try {
+                await readEvents(res, event => handleEvent(event, state));
+            } catch (e) {
+                // Connection dropped mid-stream; resumed below
+            }
+            if (state.done || state.error || !streamId || attempt >= MAX_RESUME_ATTEMPTS) break;
+
+            await new Promise(resolve => setTimeout(resolve, 500 * 2 ** attempt));
+            try {
+                res = await fetch(`/summarize_stream/${streamId}`, {
+                    headers: { 'Last-Event-ID': String(state.lastEventId) }
+                });
+            } catch (e) {
+                continue;
+            }
+            if (!res.ok || !res.body) break;
+        }
 
-            summary += chunk;
-            summaryContent.innerHTML += `<p">${chunk.trim()}</p>`;
+        if (state.error || !state.done) {
+            showError(state.error || 'Stream interrupted.');
+            return;
         }
 
         const duration = ((Date.now() - startTime) / 1000).toFixed(1);
-        displayResult({ summary, agent }, text, duration);
+        displayResult({ summary: state.summary, agent }, text, duration);
         loadHistory(displayHistory);
         clearDraft()
 
@@ -119,6 +134,58 @@ async function streamSummary(text, agent, startTime) {
     }
 }
 
+// Read SSE frames from a response body until it ends
+async function readEvents(res, onEvent) {
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder('utf-8');
+    let buffer = '';
+
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) return;
+
+        buffer += decoder.decode(value, { stream: true });
+        let end;
+        while ((end = buffer.indexOf('\n\n')) !== -1) {
+            const event = parseEvent(buffer.slice(0, end));
+            buffer = buffer.slice(end + 2);
+            if (event) onEvent(event);
+        }
+    }
+}
+
+function parseEvent(frame) {
+    let id = null, type = 'message';
+    const data = [];
+    for (const line of frame.split('\n')) {
+        if (!line || line.startsWith(':')) continue;  // keep-alive comment
+        const colon = line.indexOf(':');
+        const field = colon === -1 ? line : line.slice(0, colon);
+        let value = colon === -1 ? '' : line.slice(colon + 1);
+        if (value.startsWith(' ')) value = value.slice(1);
+        if (field === 'id') id = value;
+        else if (field === 'event') type = value;
+        else if (field === 'data') data.push(value);
+    }
+    return data.length ? { id, type, data: data.join('\n') } : null;
+}
+
+function handleEvent(event, state) {
+    if (event.id !== null) state.lastEventId = Number(event.id);
+
+    if (event.type === 'segment') {
+        state.summary += event.data;
+        if (event.data.trim()) summaryContent.innerHTML += `<p>${event.data.trim()}</p>`;
+    } else if (event.type === 'reset') {
+        // Resumed past the server's replay buffer: everything before it at once
+        state.summary = event.data;
+        summaryContent.innerHTML = event.data.trim() ? `<p>${event.data.trim()}</p>` : '';
+    } else if (event.type === 'error') {
+        state.error = event.data;
+    } else if (event.type === 'done') {
+        state.done = true;
+    }
+}
 
 // function displayResult(data, originalText, time) {
 //     const resultAgent = document.getElementById('resultAgent');
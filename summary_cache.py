@@ -0,0 +1,194 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+DEFAULT_CACHE_PATH = os.environ.get('SUMMARY_CACHE_PATH', 'instance/summary_cache.sqlite3')
+DEFAULT_MEMORY_ENTRIES = int(os.environ.get('SUMMARY_CACHE_MEMORY_ENTRIES', 256))
+DEFAULT_MAX_DISK_BYTES = int(os.environ.get('SUMMARY_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+DEFAULT_MAX_AGE = float(os.environ.get('SUMMARY_CACHE_MAX_AGE', 7 * 24 * 3600))
+
+
+def cache_key(payload):
+    """Hash the parts of a chat payload that determine the model output"""
+    material = json.dumps(
+        {
+            'model': payload.get('model'),
+            'options': payload.get('options', {}),
+            'messages': payload.get('messages', []),
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(',', ':'),
+    )
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class SummaryCache:
+    """Two-tier summary cache: in-memory LRU backed by an SQLite file"""
+
+    # Run disk eviction after this many writes rather than on every put
+    EVICT_EVERY = 32
+
+    def __init__(self,
+                 db_path=DEFAULT_CACHE_PATH,
+                 memory_entries=DEFAULT_MEMORY_ENTRIES,
+                 max_disk_bytes=DEFAULT_MAX_DISK_BYTES,
+                 max_age=DEFAULT_MAX_AGE):
+        self.db_path = db_path
+        self.memory_entries = memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.memory = OrderedDict()
+        self.writes_since_evict = 0
+        self.counters = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'stores': 0,
+            'evictions': 0,
+        }
+        self.db = self._open_db() if db_path else None
+
+    def _open_db(self):
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        db = sqlite3.connect(self.db_path, check_same_thread=False)
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute(
+            'CREATE TABLE IF NOT EXISTS summaries ('
+            ' key TEXT PRIMARY KEY,'
+            ' summary TEXT NOT NULL,'
+            ' size INTEGER NOT NULL,'
+            ' created REAL NOT NULL,'
+            ' accessed REAL NOT NULL)'
+        )
+        db.execute('CREATE INDEX IF NOT EXISTS summaries_accessed ON summaries (accessed)')
+        db.commit()
+        return db
+
+    def _remember(self, key, summary):
+        self.memory[key] = summary
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def get(self, payload):
+        """Return the cached summary for a payload, or None"""
+        key = cache_key(payload)
+        with self.lock:
+            summary = self.memory.get(key)
+            if summary is not None:
+                self.memory.move_to_end(key)
+                self.counters['memory_hits'] += 1
+                return summary
+
+            if self.db is not None:
+                now = time.time()
+                row = self.db.execute(
+                    'SELECT summary, created FROM summaries WHERE key = ?', (key,)
+                ).fetchone()
+                if row and now - row[1] <= self.max_age:
+                    self.db.execute(
+                        'UPDATE summaries SET accessed = ? WHERE key = ?', (now, key)
+                    )
+                    self.db.commit()
+                    self._remember(key, row[0])
+                    self.counters['disk_hits'] += 1
+                    return row[0]
+
+            self.counters['misses'] += 1
+            return None
+
+    def put(self, payload, summary):
+        """Store a finished summary for a payload"""
+        if not summary:
+            return
+        key = cache_key(payload)
+        with self.lock:
+            self._remember(key, summary)
+            self.counters['stores'] += 1
+            if self.db is None:
+                return
+
+            now = time.time()
+            self.db.execute(
+                'INSERT OR REPLACE INTO summaries (key, summary, size, created, accessed)'
+                ' VALUES (?, ?, ?, ?, ?)',
+                (key, summary, len(summary.encode('utf-8')), now, now),
+            )
+            self.db.commit()
+            self.writes_since_evict += 1
+            if self.writes_since_evict >= self.EVICT_EVERY:
+                self._evict(now)
+
+    def _evict(self, now):
+        """Drop expired rows, then least recently used rows over the size limit"""
+        self.writes_since_evict = 0
+        cursor = self.db.execute(
+            'DELETE FROM summaries WHERE created < ?', (now - self.max_age,)
+        )
+        evicted = cursor.rowcount
+
+        total = self.db.execute('SELECT COALESCE(SUM(size), 0) FROM summaries').fetchone()[0]
+        if total > self.max_disk_bytes:
+            excess = total - self.max_disk_bytes
+            stale_keys = []
+            for key, size in self.db.execute(
+                    'SELECT key, size FROM summaries ORDER BY accessed'):
+                stale_keys.append((key,))
+                excess -= size
+                if excess <= 0:
+                    break
+            self.db.executemany('DELETE FROM summaries WHERE key = ?', stale_keys)
+            evicted += len(stale_keys)
+
+        self.db.commit()
+        self.counters['evictions'] += evicted
+
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+            if self.db is not None:
+                self.db.execute('DELETE FROM summaries')
+                self.db.commit()
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+            stats['memory_entries'] = len(self.memory)
+            if self.db is not None:
+                count, size = self.db.execute(
+                    'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM summaries'
+                ).fetchone()
+                stats['disk_entries'] = count
+                stats['disk_bytes'] = size
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_ratio'] = (
+            (stats['memory_hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        )
+        return stats
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_summary_cache():
+    """Return the process-wide summary cache shared by every agent"""
+    global _default_cache
+    if _default_cache is None:
+        with _default_lock:
+            if _default_cache is None:
+                enabled = os.environ.get('SUMMARY_CACHE', '1') != '0'
+                _default_cache = SummaryCache(
+                    db_path=DEFAULT_CACHE_PATH if enabled else None,
+                    memory_entries=DEFAULT_MEMORY_ENTRIES if enabled else 0,
+                )
+    return _default_cache
@@ -0,0 +1,344 @@
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+
+DEFAULT_CONNECT_TIMEOUT = float(os.environ.get('OLLAMA_CONNECT_TIMEOUT', 3.05))
+DEFAULT_READ_TIMEOUT = float(os.environ.get('OLLAMA_READ_TIMEOUT', 120))
+DEFAULT_POOL_CONNECTIONS = int(os.environ.get('OLLAMA_POOL_CONNECTIONS', 4))
+DEFAULT_POOL_MAXSIZE = int(os.environ.get('OLLAMA_POOL_MAXSIZE', 32))
+
+
+# The CancelScope of the request the current thread is making, if any
+_local = threading.local()
+
+
+def _shutdown(connection):
+    sock = connection.sock
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+class CancelScope:
+    """Lets another thread abort the request sent inside cancellable(scope)
+
+    Closing a response from another thread does not wake a reader blocked
+    in recv(), and until Ollama has prefilled the prompt there is no
+    response to close at all. Shutting the socket down does both: the
+    blocked call fails at once and Ollama sees the client go away. The
+    connection is released from the scope when it goes back to the pool,
+    so a cancel never reaches a later request on the same socket.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.cancelled = False
+        self.connection = None
+        self.callbacks = []
+
+    def is_set(self):
+        return self.cancelled
+
+    def add_callback(self, callback):
+        """Call callback() on cancel, or right away if already cancelled"""
+        with self.lock:
+            if not self.cancelled:
+                self.callbacks.append(callback)
+                return
+        callback()
+
+    def cancel(self):
+        with self.lock:
+            if self.cancelled:
+                return
+            self.cancelled = True
+            if self.connection is not None:
+                _shutdown(self.connection)
+            callbacks, self.callbacks = self.callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def _bind(self, connection):
+        with self.lock:
+            self.connection = connection
+            connection.cancel_scope = self
+            if self.cancelled:
+                _shutdown(connection)
+
+    def _unbind(self, connection):
+        with self.lock:
+            if self.connection is connection:
+                self.connection = None
+            connection.cancel_scope = None
+
+
+@contextmanager
+def cancellable(scope):
+    """Let scope.cancel() abort the requests this thread sends within the block"""
+    previous = getattr(_local, 'scope', None)
+    _local.scope = scope
+    try:
+        yield scope
+    finally:
+        _local.scope = previous
+
+
+def is_cancelled():
+    """Whether the request this thread is sending was aborted through its CancelScope"""
+    scope = getattr(_local, 'scope', None)
+    return scope is not None and scope.cancelled
+
+
+class _CancellableConnectionMixin:
+    cancel_scope = None
+
+    def request(self, *args, **kwargs):
+        super().request(*args, **kwargs)
+        # Bound once the request is on the wire, for the header wait and the body
+        scope = getattr(_local, 'scope', None)
+        if scope is not None:
+            scope._bind(self)
+
+
+class _CancellableHTTPConnection(_CancellableConnectionMixin, HTTPConnection):
+    pass
+
+
+class _CancellableHTTPSConnection(_CancellableConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _CancellablePoolMixin:
+    def _put_conn(self, conn):
+        if conn is not None and conn.cancel_scope is not None:
+            conn.cancel_scope._unbind(conn)
+        super()._put_conn(conn)
+
+
+class _CancellableHTTPConnectionPool(_CancellablePoolMixin, HTTPConnectionPool):
+    ConnectionCls = _CancellableHTTPConnection
+
+
+class _CancellableHTTPSConnectionPool(_CancellablePoolMixin, HTTPSConnectionPool):
+    ConnectionCls = _CancellableHTTPSConnection
+
+
+class _CancellableAdapter(HTTPAdapter):
+    """HTTPAdapter whose connections can be aborted through a CancelScope"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _CancellableHTTPConnectionPool,
+            'https': _CancellableHTTPSConnectionPool,
+        }
+
+
+class HostStats:
+    """Request counters for one backend host"""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.in_flight = 0
+        self.total_connect_seconds = 0.0
+
+    def to_dict(self):
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'timeouts': self.timeouts,
+            'in_flight': self.in_flight,
+            'avg_headers_seconds': (
+                self.total_connect_seconds / self.requests if self.requests else 0.0
+            ),
+        }
+
+
+class _TrackedResponse:
+    """Proxy around a streaming response that updates host stats on close"""
+
+    def __init__(self, response, transport, host, on_close=None):
+        self._response = response
+        self._transport = transport
+        self._host = host
+        self._on_close = on_close
+        self._closed = False
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+    def __iter__(self):
+        return iter(self._response)
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._transport._finish(self._host)
+            if self._on_close is not None:
+                self._on_close(self._response.status_code == 200)
+        self._response.close()
+
+
+class OllamaTransport:
+    """Shared keep-alive HTTP client with a connection pool per backend host"""
+
+    def __init__(self,
+                 connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout=DEFAULT_READ_TIMEOUT,
+                 pool_connections=DEFAULT_POOL_CONNECTIONS,
+                 pool_maxsize=DEFAULT_POOL_MAXSIZE):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.lock = threading.Lock()
+        self.stats = {}
+        self.session = self._build_session()
+
+    def _build_session(self):
+        # pool_block keeps us at pool_maxsize sockets per host instead of
+        # opening throwaway connections once the pool is exhausted
+        adapter = _CancellableAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=True,
+            max_retries=0,
+        )
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers.update({'Connection': 'keep-alive'})
+        self.adapter = adapter
+        return session
+
+    def configure(self, connect_timeout=None, read_timeout=None,
+                  pool_connections=None, pool_maxsize=None):
+        """Update timeouts and pool sizes; pool changes rebuild the session"""
+        if connect_timeout is not None:
+            self.connect_timeout = connect_timeout
+        if read_timeout is not None:
+            self.read_timeout = read_timeout
+        if pool_connections is not None or pool_maxsize is not None:
+            self.pool_connections = pool_connections or self.pool_connections
+            self.pool_maxsize = pool_maxsize or self.pool_maxsize
+            old_session = self.session
+            self.session = self._build_session()
+            old_session.close()
+
+    def _host_stats(self, host):
+        stats = self.stats.get(host)
+        if stats is None:
+            stats = self.stats[host] = HostStats()
+        return stats
+
+    def _finish(self, host):
+        with self.lock:
+            self._host_stats(host).in_flight -= 1
+
+    def get(self, url, timeout=None):
+        """GET through the shared pool (used for health checks)"""
+        return self.request('GET', url, timeout=timeout)
+
+    def post(self, url, json=None, headers=None, stream=False, timeout=None, on_close=None):
+        """POST through the shared pool; streaming responses must be closed
+
+        on_close, if given, is called once with whether the status was 200
+        when a streaming response is closed.
+        """
+        return self.request('POST', url, json=json, headers=headers, stream=stream,
+                            timeout=timeout, on_close=on_close)
+
+    def request(self, method, url, json=None, headers=None, stream=False, timeout=None,
+                on_close=None):
+        host = urlsplit(url).netloc
+        with self.lock:
+            stats = self._host_stats(host)
+            stats.requests += 1
+            stats.in_flight += 1
+
+        start = time.perf_counter()
+        try:
+            response = self.session.request(
+                method,
+                url,
+                json=json,
+                headers=headers,
+                stream=stream,
+                timeout=timeout or (self.connect_timeout, self.read_timeout),
+            )
+        except requests.exceptions.Timeout:
+            with self.lock:
+                stats.timeouts += 1
+                stats.errors += 1
+            self._finish(host)
+            raise
+        except requests.exceptions.RequestException:
+            # An aborted request says nothing about the host
+            if not is_cancelled():
+                with self.lock:
+                    stats.errors += 1
+            self._finish(host)
+            raise
+
+        with self.lock:
+            stats.total_connect_seconds += time.perf_counter() - start
+            if response.status_code != 200:
+                stats.errors += 1
+
+        if not stream:
+            self._finish(host)
+            return response
+        return _TrackedResponse(response, self, host, on_close)
+
+    def pool_stats(self):
+        """Per-host connection pool and request counters"""
+        pools = {}
+        manager = self.adapter.poolmanager
+        for key in list(manager.pools.keys()):
+            pool = manager.pools.get(key)
+            if pool is None:
+                continue
+            host = f"{pool.host}:{pool.port}"
+            pools[host] = {
+                'connections_opened': pool.num_connections,
+                'requests_sent': pool.num_requests,
+                'free_slots': pool.pool.qsize() if pool.pool else 0,
+                'maxsize': self.pool_maxsize,
+            }
+
+        with self.lock:
+            hosts = {host: stats.to_dict() for host, stats in self.stats.items()}
+
+        return {
+            'connect_timeout': self.connect_timeout,
+            'read_timeout': self.read_timeout,
+            'pools': pools,
+            'hosts': hosts,
+        }
+
+
+_default_transport = None
+_default_lock = threading.Lock()
+
+
+def get_transport():
+    """Return the process-wide transport shared by every agent"""
+    global _default_transport
+    if _default_transport is None:
+        with _default_lock:
+            if _default_transport is None:
+                _default_transport = OllamaTransport()
+    return _default_transport